@@ -71,3 +71,67 @@ CREATE TABLE IF NOT EXISTS patient_features (
 CREATE INDEX IF NOT EXISTS idx_patient_features_pseudo_id ON patient_features(pseudo_patient_id);
 CREATE INDEX IF NOT EXISTS idx_patient_features_encounter_id ON patient_features(encounter_id);
 CREATE INDEX IF NOT EXISTS idx_patient_features_version ON patient_features(feature_version);
+-- Covering index for latest-row feature reads (replaces ix_pf_pid_computed)
+DROP INDEX IF EXISTS ix_pf_pid_computed;
+CREATE INDEX IF NOT EXISTS ix_pf_pid_computed_cov ON patient_features(pseudo_patient_id, computed_at DESC)
+INCLUDE (
+    age_at_admission,
+    gender_encoded,
+    length_of_stay,
+    previous_admissions_30d,
+    previous_admissions_90d,
+    previous_admissions_365d,
+    charlson_comorbidity_index,
+    heart_rate_last,
+    blood_pressure_systolic_last,
+    blood_pressure_diastolic_last,
+    respiratory_rate_last,
+    temperature_last,
+    oxygen_saturation_last,
+    hemoglobin_last,
+    creatinine_last,
+    sodium_last,
+    potassium_last,
+    glucose_last,
+    wbc_count_last,
+    nlp_sentiment_score,
+    nlp_urgency_score,
+    nlp_complexity_score,
+    diagnosis_count,
+    has_diabetes,
+    has_hypertension,
+    has_heart_failure,
+    has_copd,
+    has_ckd,
+    has_cancer,
+    medication_count,
+    procedure_count,
+    discharge_to_home
+);
+
+-- NLP entities extracted from clinical notes (featurizer service)
+CREATE TABLE IF NOT EXISTS nlp_entities (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    note_id UUID,
+    pseudo_patient_id VARCHAR(100) NOT NULL,
+    entity_type VARCHAR(50) NOT NULL,
+    entity_text VARCHAR(500) NOT NULL,
+    entity_code VARCHAR(50),
+    entity_system VARCHAR(200),
+    confidence FLOAT,
+    start_position INTEGER,
+    end_position INTEGER,
+    context TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Conflict target for the featurizer's ON CONFLICT DO NOTHING insert. Drop
+-- duplicates stored before the index existed, keeping one row of each.
+DELETE FROM nlp_entities a
+USING nlp_entities b
+WHERE a.pseudo_patient_id = b.pseudo_patient_id
+  AND a.entity_text = b.entity_text
+  AND a.entity_type = b.entity_type
+  AND a.ctid > b.ctid;
+CREATE UNIQUE INDEX IF NOT EXISTS uq_nlp_entities_patient_text_type
+    ON nlp_entities(pseudo_patient_id, entity_text, entity_type);
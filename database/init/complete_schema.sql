@@ -97,6 +97,33 @@ CREATE TABLE IF NOT EXISTS patient_features (
 CREATE INDEX IF NOT EXISTS idx_features_pseudo_id ON patient_features(pseudo_patient_id);
 CREATE INDEX IF NOT EXISTS idx_features_timestamp ON patient_features(extraction_timestamp);
 
+-- NLP entities extracted from clinical notes (featurizer service)
+CREATE TABLE IF NOT EXISTS nlp_entities (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    note_id UUID,
+    pseudo_patient_id VARCHAR(100) NOT NULL,
+    entity_type VARCHAR(50) NOT NULL,
+    entity_text VARCHAR(500) NOT NULL,
+    entity_code VARCHAR(50),
+    entity_system VARCHAR(200),
+    confidence FLOAT,
+    start_position INTEGER,
+    end_position INTEGER,
+    context TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Conflict target for the featurizer's ON CONFLICT DO NOTHING insert. Drop
+-- duplicates stored before the index existed, keeping one row of each.
+DELETE FROM nlp_entities a
+USING nlp_entities b
+WHERE a.pseudo_patient_id = b.pseudo_patient_id
+  AND a.entity_text = b.entity_text
+  AND a.entity_type = b.entity_type
+  AND a.ctid > b.ctid;
+CREATE UNIQUE INDEX IF NOT EXISTS uq_nlp_entities_patient_text_type
+    ON nlp_entities(pseudo_patient_id, entity_text, entity_type);
+
 -- ============================================
 -- Risk Predictions (model-risque service)
 -- ============================================
@@ -119,6 +146,36 @@ CREATE TABLE IF NOT EXISTS risk_predictions (
 CREATE INDEX IF NOT EXISTS idx_predictions_pseudo_id ON risk_predictions(pseudo_patient_id);
 CREATE INDEX IF NOT EXISTS idx_predictions_risk_score ON risk_predictions(risk_score);
 CREATE INDEX IF NOT EXISTS idx_predictions_timestamp ON risk_predictions(prediction_timestamp);
+CREATE INDEX IF NOT EXISTS ix_rp_pid_ts ON risk_predictions(pseudo_patient_id, prediction_timestamp DESC);
+CREATE INDEX IF NOT EXISTS ix_rp_score_ts ON risk_predictions(risk_score DESC, prediction_timestamp DESC);
+-- High-risk listings query risk_score >= 0.7 by default; index only the >= 0.5 tail
+CREATE INDEX IF NOT EXISTS ix_rp_high_risk ON risk_predictions(risk_score DESC) WHERE risk_score >= 0.5;
+
+-- Dashboard aggregates precomputed in a single-row materialized view, kept
+-- current by score-api with REFRESH ... CONCURRENTLY. The constant id carries
+-- the unique index a concurrent refresh requires; refreshed_at lets workers
+-- skip a refresh another one has just done. The view holds derived data
+-- only, so it is recreated to pick up definition changes.
+DROP MATERIALIZED VIEW IF EXISTS mv_dashboard_stats;
+CREATE MATERIALIZED VIEW mv_dashboard_stats AS
+WITH latest AS (
+    SELECT DISTINCT ON (pseudo_patient_id) risk_level, risk_score
+    FROM risk_predictions
+    ORDER BY pseudo_patient_id, prediction_timestamp DESC
+)
+SELECT 1 AS id,
+       (SELECT COUNT(DISTINCT pseudo_id) FROM deid_patients) AS total_patients,
+       COUNT(*) FILTER (WHERE risk_level = 'HIGH') AS high_risk_patients,
+       COUNT(*) FILTER (WHERE risk_level = 'MEDIUM') AS medium_risk_patients,
+       COUNT(*) FILTER (WHERE risk_level = 'LOW') AS low_risk_patients,
+       (SELECT COUNT(*) FROM risk_predictions
+        WHERE prediction_timestamp >= current_date
+          AND prediction_timestamp < current_date + 1) AS predictions_today,
+       AVG(risk_score) AS average_risk_score,
+       now() AS refreshed_at
+FROM latest;
+
+CREATE UNIQUE INDEX ux_mv_dashboard_stats ON mv_dashboard_stats (id);
 
 -- ============================================
 -- Fairness Metrics (audit-fairness service)
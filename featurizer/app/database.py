@@ -10,10 +10,12 @@ settings = get_settings()
 engine = create_engine(
     settings.database_url,
     poolclass=QueuePool,
-    pool_size=10,
-    max_overflow=20,
+    pool_size=20,
+    max_overflow=10,
     pool_timeout=30,
     pool_recycle=1800,
+    pool_pre_ping=True,
+    query_cache_size=1200,
 )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
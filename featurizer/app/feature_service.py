@@ -1,8 +1,10 @@
 """Feature extraction service for patient data."""
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any, List, Tuple
+from typing import Optional, Dict, Any, List
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import and_, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+import numpy as np
 import structlog
 
 from app.config import get_settings
@@ -15,6 +17,57 @@ from app.nlp_service import nlp_service
 settings = get_settings()
 logger = structlog.get_logger()
 
+# Age group label -> representative age for the de-identification service's
+# bins and decade ranges; other "lo-hi" labels are parsed on each call. The
+# table is never written to, so request data cannot grow it.
+AGE_LUT: Dict[str, Optional[int]] = {
+    f"{lo}-{hi}": (lo + hi) // 2
+    for lo, hi in [(0, 18), (18, 30), (30, 45), (45, 60), (60, 75), (75, 90), (90, 120)]
+    + [(lo, lo + 10) for lo in range(0, 90, 10)]
+}
+AGE_LUT["90+"] = 92
+
+GENDER_LUT: Dict[str, int] = {"male": 0, "female": 1, "other": 2, "unknown": 3}
+
+
+def age_from_group(age_group: Optional[str]) -> Optional[int]:
+    """Representative age for an age group label, or None if unparseable."""
+    if not age_group:
+        return None
+    try:
+        return AGE_LUT[age_group]
+    except KeyError:
+        pass
+    
+    if "-" in age_group:
+        try:
+            min_age, max_age = age_group.split("-")
+            return (int(min_age) + int(max_age)) // 2
+        except ValueError:
+            return None
+    return None
+
+
+def charlson_batch(
+    diabetes: np.ndarray,
+    heart_failure: np.ndarray,
+    copd: np.ndarray,
+    ckd: np.ndarray,
+    cancer: np.ndarray,
+    age: np.ndarray
+) -> np.ndarray:
+    """Simplified Charlson Comorbidity Index for arrays of patients.
+
+    Condition weights are 1 (diabetes, heart failure, COPD) and 2 (CKD,
+    cancer); from age 50 one point is added per decade over 40.
+    """
+    score = (
+        diabetes + heart_failure + copd
+        + 2.0 * ckd + 2.0 * cancer
+    ).astype(np.float64)
+    score += np.where(age >= 50, (age - 40) // 10, 0)
+    return score
+
 
 class FeatureService:
     """Service for extracting patient features for ML models."""
@@ -32,26 +85,66 @@ class FeatureService:
     ) -> Optional[PatientFeatures]:
         """Extract all features for a patient."""
         
-        # Get de-identified patient
-        deid_patient = self.db.query(DeidPatient).filter(
-            DeidPatient.pseudo_id == pseudo_patient_id
+        # Get de-identified patient and any stored features in one round-trip
+        row = self._patients_with_features(
+            DeidPatient.pseudo_id == pseudo_patient_id, encounter_id
         ).first()
         
-        if not deid_patient:
+        if not row:
             logger.warning("Patient not found", pseudo_id=pseudo_patient_id)
             return None
         
-        # Check if features already exist
-        existing = self.db.query(PatientFeatures).filter(
-            PatientFeatures.pseudo_patient_id == pseudo_patient_id,
-            PatientFeatures.encounter_id == encounter_id,
-            PatientFeatures.feature_version == settings.feature_version
-        ).first()
-        
+        deid_patient, existing = row
+        return self._extract_for_patient(
+            deid_patient, existing, encounter_id,
+            include_nlp, include_vitals, include_labs
+        )
+    
+    def _patients_with_features(self, criterion, encounter_id: Optional[str] = None):
+        """Query (DeidPatient, PatientFeatures or None) rows for current features."""
+        return self.db.query(DeidPatient, PatientFeatures).outerjoin(
+            PatientFeatures,
+            and_(
+                PatientFeatures.pseudo_patient_id == DeidPatient.pseudo_id,
+                PatientFeatures.encounter_id == encounter_id,
+                PatientFeatures.feature_version == settings.feature_version
+            )
+        ).filter(criterion)
+    
+    def _extract_for_patient(
+        self,
+        deid_patient: DeidPatient,
+        existing: Optional[PatientFeatures],
+        encounter_id: Optional[str],
+        include_nlp: bool,
+        include_vitals: bool,
+        include_labs: bool
+    ) -> PatientFeatures:
+        """Compute and store features for an already loaded patient."""
         if existing:
-            logger.info("Using existing features", pseudo_id=pseudo_patient_id)
+            logger.info("Using existing features", pseudo_id=deid_patient.pseudo_id)
             return existing
         
+        features = self._build_features(
+            deid_patient, encounter_id, include_nlp, include_vitals, include_labs
+        )
+        
+        # Calculate comorbidity indices
+        self._calculate_comorbidity_indices(features, deid_patient.original_fhir_id)
+        
+        return self._save_features(features)
+    
+    def _build_features(
+        self,
+        deid_patient: DeidPatient,
+        encounter_id: Optional[str],
+        include_nlp: bool,
+        include_vitals: bool,
+        include_labs: bool
+    ) -> PatientFeatures:
+        """Compute features for a patient, except the comorbidity indices."""
+        pseudo_patient_id = deid_patient.pseudo_id
+        
         # Get original FHIR ID for lookups
         original_fhir_id = deid_patient.original_fhir_id
         
@@ -83,16 +176,16 @@ class FeatureService:
         if include_nlp:
             self._extract_nlp_features(features, original_fhir_id, pseudo_patient_id)
         
-        # Calculate comorbidity indices
-        self._calculate_comorbidity_indices(features, original_fhir_id)
-        
-        # Save features
+        return features
+    
+    def _save_features(self, features: PatientFeatures) -> PatientFeatures:
+        """Store a computed feature row."""
         self.db.add(features)
         self.db.commit()
         self.db.refresh(features)
         
         logger.info("Features extracted successfully", 
-                   pseudo_id=pseudo_patient_id,
+                   pseudo_id=features.pseudo_patient_id,
                    feature_version=settings.feature_version)
         
         return features
@@ -100,21 +193,13 @@ class FeatureService:
     def _extract_demographics(self, features: PatientFeatures, deid_patient: DeidPatient):
         """Extract demographic features."""
         # Parse age from age_group
-        age_group = deid_patient.age_group
-        if age_group and "-" in age_group:
-            try:
-                min_age, max_age = age_group.split("-")
-                features.age_at_admission = (int(min_age) + int(max_age)) // 2
-            except ValueError:
-                features.age_at_admission = None
-        elif age_group == "90+":
-            features.age_at_admission = 92
+        if deid_patient.age_group:
+            features.age_at_admission = age_from_group(deid_patient.age_group)
         
         # Encode gender
         gender = deid_patient.gender
         if gender:
-            gender_map = {"male": 0, "female": 1, "other": 2, "unknown": 3}
-            features.gender_encoded = gender_map.get(gender.lower(), 3)
+            features.gender_encoded = GENDER_LUT.get(gender.lower(), 3)
     
     def _extract_encounter_features(
         self, 
@@ -246,6 +331,7 @@ class FeatureService:
         total_entities = 0
         total_medications = 0
         total_symptoms = 0
+        entity_rows = []
         
         for note in notes:
             if not note.note_text:
@@ -260,17 +346,18 @@ class FeatureService:
             total_medications += analysis["medication_mentions"]
             total_symptoms += analysis["symptom_mentions"]
             
-            # Save extracted entities
+            # Collect extracted entities for a single bulk insert
             for entity_data in analysis["entities"]:
-                entity = NlpEntity(
-                    pseudo_patient_id=pseudo_patient_id,
-                    entity_type=entity_data["entity_type"],
-                    entity_text=entity_data["entity_text"],
-                    confidence=entity_data.get("confidence"),
-                    start_position=entity_data.get("start_position"),
-                    end_position=entity_data.get("end_position")
-                )
-                self.db.add(entity)
+                entity_rows.append({
+                    "pseudo_patient_id": pseudo_patient_id,
+                    "entity_type": entity_data["entity_type"],
+                    "entity_text": entity_data["entity_text"],
+                    "confidence": entity_data.get("confidence"),
+                    "start_position": entity_data.get("start_position"),
+                    "end_position": entity_data.get("end_position")
+                })
+        
+        self._save_entities(entity_rows)
         
         # Calculate averages
         if all_sentiment:
@@ -284,6 +371,16 @@ class FeatureService:
         features.nlp_medication_mentions = total_medications
         features.nlp_symptom_mentions = total_symptoms
     
+    def _save_entities(self, entity_rows: List[Dict[str, Any]]):
+        """Insert NLP entities in one statement, skipping already-stored ones."""
+        if not entity_rows:
+            return
+        
+        stmt = pg_insert(NlpEntity).on_conflict_do_nothing(
+            index_elements=["pseudo_patient_id", "entity_text", "entity_type"]
+        )
+        self.db.execute(stmt, entity_rows)
+    
     def _calculate_comorbidity_indices(
         self, 
         features: PatientFeatures, 
@@ -291,6 +388,7 @@ class FeatureService:
     ):
         """Calculate Charlson Comorbidity Index."""
         # Simplified Charlson calculation based on available conditions
+        # (same weights as charlson_batch, which batch extraction uses)
         score = 0
         
         if features.has_diabetes:
@@ -314,6 +412,31 @@ class FeatureService:
         # Simplified Elixhauser score (just sum of conditions)
         features.elixhauser_score = float(features.diagnosis_count or 0)
     
+    def batch_calculate_comorbidity(self, features_list: List[PatientFeatures]):
+        """Calculate comorbidity indices for many feature rows at once."""
+        if not features_list:
+            return
+        
+        def flags(attr: str) -> np.ndarray:
+            return np.fromiter(
+                (bool(getattr(f, attr)) for f in features_list),
+                dtype=np.float64, count=len(features_list)
+            )
+        
+        age = np.fromiter(
+            (f.age_at_admission or 0 for f in features_list),
+            dtype=np.int64, count=len(features_list)
+        )
+        scores = charlson_batch(
+            flags("has_diabetes"), flags("has_heart_failure"), flags("has_copd"),
+            flags("has_ckd"), flags("has_cancer"), age
+        )
+        
+        for features, score in zip(features_list, scores.tolist()):
+            features.charlson_comorbidity_index = score
+            # Simplified Elixhauser score (just sum of conditions)
+            features.elixhauser_score = float(features.diagnosis_count or 0)
+    
     def batch_extract_features(
         self,
         pseudo_patient_ids: List[str],
@@ -321,34 +444,69 @@ class FeatureService:
         include_vitals: bool = True,
         include_labs: bool = True
     ) -> Dict[str, Any]:
-        """Extract features for multiple patients."""
-        results = []
+        """Extract features for multiple patients (repeated ids are processed once)."""
         errors = []
+        pseudo_patient_ids = list(dict.fromkeys(pseudo_patient_ids))
         
-        for pseudo_id in pseudo_patient_ids:
-            try:
-                features = self.extract_features(
-                    pseudo_id,
-                    include_nlp=include_nlp,
-                    include_vitals=include_vitals,
-                    include_labs=include_labs
-                )
-                
-                if features:
-                    results.append(features)
-                else:
+        # Load all patients and their stored features with a single query
+        rows = self._patients_with_features(
+            DeidPatient.pseudo_id.in_(pseudo_patient_ids)
+        ).all()
+        loaded = {}
+        for deid_patient, existing in rows:
+            loaded.setdefault(deid_patient.pseudo_id, (deid_patient, existing))
+        
+        # Each patient is committed on its own; keep the preloaded rows (and
+        # the features already returned) loaded across those commits instead
+        # of re-selecting every one on next access
+        expire_on_commit = self.db.expire_on_commit
+        self.db.expire_on_commit = False
+        done: Dict[str, PatientFeatures] = {}
+        try:
+            # Compute features for patients without stored ones
+            built: List[PatientFeatures] = []
+            for pseudo_id in pseudo_patient_ids:
+                if pseudo_id not in loaded:
                     errors.append({
                         "pseudo_patient_id": pseudo_id,
                         "error": "Patient not found"
                     })
-                    
-            except Exception as e:
-                logger.error("Error extracting features",
-                           pseudo_id=pseudo_id, error=str(e))
-                errors.append({
-                    "pseudo_patient_id": pseudo_id,
-                    "error": str(e)
-                })
+                    continue
+                
+                deid_patient, existing = loaded[pseudo_id]
+                if existing:
+                    done[pseudo_id] = existing
+                    continue
+                
+                try:
+                    built.append(self._build_features(
+                        deid_patient, None, include_nlp, include_vitals, include_labs
+                    ))
+                except Exception as e:
+                    logger.error("Error extracting features",
+                               pseudo_id=pseudo_id, error=str(e))
+                    errors.append({
+                        "pseudo_patient_id": pseudo_id,
+                        "error": str(e)
+                    })
+            
+            # Score comorbidities for the whole batch at once, then store
+            self.batch_calculate_comorbidity(built)
+            for features in built:
+                try:
+                    done[features.pseudo_patient_id] = self._save_features(features)
+                except Exception as e:
+                    logger.error("Error saving features",
+                               pseudo_id=features.pseudo_patient_id, error=str(e))
+                    errors.append({
+                        "pseudo_patient_id": features.pseudo_patient_id,
+                        "error": str(e)
+                    })
+        finally:
+            self.db.expire_on_commit = expire_on_commit
+        
+        # Results in request order
+        results = [done[pid] for pid in pseudo_patient_ids if pid in done]
         
         return {
             "total_processed": len(pseudo_patient_ids),
@@ -1,8 +1,11 @@
 """Main FastAPI application for Featurizer service."""
+import asyncio
+import time
 from datetime import datetime
-from typing import List
+from typing import List, Optional, Tuple
 from fastapi import FastAPI, Depends, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 import structlog
@@ -22,13 +25,21 @@ from prometheus_fastapi_instrumentator import Instrumentator
 settings = get_settings()
 logger = structlog.get_logger()
 
+# Health probe cache: (monotonic timestamp, db status)
+HEALTH_CACHE_TTL_SECONDS = 2.0
+_last_health: Tuple[float, bool] = (0.0, False)
+
+# Background model preload, kept referenced so it isn't garbage collected
+_model_loading_task: Optional[asyncio.Task] = None
+
 # Create FastAPI app
 app = FastAPI(
     title="Featurizer Service",
     description="Feature Extraction Service for HealthFlow-MS - NLP and Clinical Data Processing",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=ORJSONResponse
 )
 
 # Initialize Prometheus metrics BEFORE middlewares
@@ -49,23 +60,44 @@ async def startup_event():
     """Initialize on startup."""
     logger.info("Starting Featurizer service", port=settings.service_port)
 
-    # Pre-load NLP models
+    # Pre-load NLP models in a worker thread so the server can answer
+    # health probes while BioBERT loads
+    global _model_loading_task
+    _model_loading_task = asyncio.create_task(_preload_models())
+
+
+async def _preload_models():
+    """Load NLP models off the event loop."""
     try:
-        nlp_service.ensure_models_loaded()
+        await asyncio.to_thread(nlp_service.ensure_models_loaded)
         logger.info("NLP models loaded successfully")
     except Exception as e:
         logger.warning(f"Could not preload NLP models: {e}")
 
 
-@app.get("/health", response_model=HealthResponse, tags=["Health"])
-async def health_check(db: Session = Depends(get_db)):
-    """Health check endpoint."""
+def _probe_database(db: Session) -> bool:
+    """Run SELECT 1 at most once per TTL; probes in between reuse the result."""
+    global _last_health
+    checked_at, db_status = _last_health
+    now = time.monotonic()
+    if now - checked_at < HEALTH_CACHE_TTL_SECONDS:
+        return db_status
+    
     try:
         db.execute(text("SELECT 1"))
         db_status = True
     except Exception:
         db_status = False
     
+    _last_health = (now, db_status)
+    return db_status
+
+
+@app.get("/health", response_model=HealthResponse, tags=["Health"])
+def health_check(db: Session = Depends(get_db)):
+    """Health check endpoint (a plain def, so the probe runs in the threadpool)."""
+    db_status = _probe_database(db)
+    
     models_loaded = {
         "spacy": nlp_service.nlp is not None,
         "biobert": nlp_service.model is not None
@@ -79,6 +111,23 @@ async def health_check(db: Session = Depends(get_db)):
     )
 
 
+@app.get("/ready", tags=["Health"])
+async def readiness_check():
+    """Readiness probe: 503 until the NLP models are loaded."""
+    models_loaded = {
+        "spacy": nlp_service.nlp is not None,
+        "biobert": nlp_service.model is not None
+    }
+    
+    if not all(models_loaded.values()):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="NLP models are still loading"
+        )
+    
+    return {"status": "READY", "models_loaded": models_loaded}
+
+
 @app.post("/api/features/extract", response_model=PatientFeaturesResponse, tags=["Features"])
 async def extract_features(
     request: FeatureExtractionRequest,
@@ -91,7 +140,9 @@ async def extract_features(
     """
     service = FeatureService(db)
     
-    features = service.extract_features(
+    # Feature extraction runs the NLP pipeline; keep it off the event loop
+    features = await asyncio.to_thread(
+        service.extract_features,
         request.pseudo_patient_id,
         encounter_id=request.encounter_id,
         include_nlp=request.include_nlp,
@@ -117,7 +168,8 @@ async def batch_extract_features(
     Extract features for multiple patients.
     """
     service = FeatureService(db)
-    result = service.batch_extract_features(
+    result = await asyncio.to_thread(
+        service.batch_extract_features,
         request.pseudo_patient_ids,
         include_nlp=request.include_nlp,
         include_vitals=request.include_vitals,
@@ -154,7 +206,7 @@ async def analyze_text(request: NlpAnalysisRequest):
     
     Extracts entities, computes sentiment, urgency, and complexity scores.
     """
-    result = nlp_service.analyze_text(request.text)
+    result = await asyncio.to_thread(nlp_service.analyze_text, request.text)
     
     return NlpAnalysisResponse(
         entities=result["entities"],
@@ -171,7 +223,7 @@ async def extract_entities(text: str):
     """
     Extract named entities from clinical text.
     """
-    entities = nlp_service.extract_entities(text)
+    entities = await asyncio.to_thread(nlp_service.extract_entities, text)
     return {"entities": entities}
 
 
@@ -1,5 +1,5 @@
 """SQLAlchemy models for Featurizer service."""
-from sqlalchemy import Column, String, Integer, Boolean, DateTime, Text, Float, JSON
+from sqlalchemy import Column, String, Integer, Boolean, DateTime, Text, Float, JSON, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 import uuid
@@ -97,6 +97,15 @@ class NlpEntity(Base):
     context = Column(Text)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    __table_args__ = (
+        # Conflict target for the bulk ON CONFLICT DO NOTHING insert
+        Index(
+            "uq_nlp_entities_patient_text_type",
+            "pseudo_patient_id", "entity_text", "entity_type",
+            unique=True
+        ),
+    )
+
 
 class DeidPatient(Base):
     """De-identified patient (read-only)."""
@@ -1,6 +1,10 @@
 """NLP service for clinical text processing."""
+import os
 import re
+import threading
+from dataclasses import dataclass
 from typing import Dict, Any, List, Optional, Tuple
+import numpy as np
 import structlog
 
 logger = structlog.get_logger()
@@ -34,8 +38,8 @@ def get_biobert_model():
         try:
             from transformers import AutoTokenizer, AutoModel
             model_name = "dmis-lab/biobert-base-cased-v1.2"
-            _biobert_tokenizer = AutoTokenizer.from_pretrained(model_name)
-            _biobert_model = AutoModel.from_pretrained(model_name)
+            _biobert_tokenizer = AutoTokenizer.from_pretrained(model_name, use_fast=True)
+            _biobert_model = _quantize_for_cpu(AutoModel.from_pretrained(model_name))
             logger.info("BioBERT model loaded")
         except Exception as e:
             logger.warning(f"Could not load BioBERT: {e}")
@@ -43,6 +47,22 @@ def get_biobert_model():
     return _biobert_tokenizer, _biobert_model
 
 
+def _quantize_for_cpu(model):
+    """Apply int8 dynamic quantization to the Linear layers for CPU inference."""
+    import torch
+    
+    torch.set_num_threads(os.cpu_count() or 1)
+    model.eval()
+    try:
+        model = torch.quantization.quantize_dynamic(
+            model, {torch.nn.Linear}, dtype=torch.qint8
+        )
+        logger.info("BioBERT quantized to int8")
+    except Exception as e:
+        logger.warning(f"Could not quantize BioBERT, using FP32: {e}")
+    return model
+
+
 # Medical entity patterns
 MEDICATION_PATTERNS = [
     r'\b(aspirin|ibuprofen|acetaminophen|metformin|lisinopril|atorvastatin|omeprazole|losartan|amlodipine|metoprolol)\b',
@@ -70,6 +90,41 @@ NEGATION_PATTERNS = [
     r'ruled\s+out\s+'
 ]
 
+# Compiled once at import; case-insensitive so spans index the original text
+MEDICATION_REGEXES = [re.compile(p, re.IGNORECASE) for p in MEDICATION_PATTERNS]
+SYMPTOM_REGEXES = [re.compile(p, re.IGNORECASE) for p in SYMPTOM_PATTERNS]
+NEGATION_RX = re.compile("|".join(f"(?:{p})" for p in NEGATION_PATTERNS))
+NEGATION_WINDOW = 50
+
+POSITIVE_TERMS = ['improving', 'stable', 'resolved', 'negative', 'normal', 'good', 'well']
+NEGATIVE_TERMS = ['worsening', 'severe', 'critical', 'positive', 'abnormal', 'poor', 'failed']
+
+
+@dataclass(slots=True)
+class Entity:
+    """Extracted entity; kept as a slotted object until serialization."""
+    entity_type: str
+    entity_text: str
+    start_position: int
+    end_position: int
+    confidence: float
+    source: str
+    negated: Optional[bool] = None
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to the dict shape returned by the API."""
+        data = {
+            "entity_type": self.entity_type,
+            "entity_text": self.entity_text,
+            "start_position": self.start_position,
+            "end_position": self.end_position,
+            "confidence": self.confidence,
+            "source": self.source
+        }
+        if self.negated is not None:
+            data["negated"] = self.negated
+        return data
+
 
 class NLPService:
     """Service for NLP processing of clinical text."""
@@ -78,94 +133,107 @@ class NLPService:
         self.nlp = None
         self.tokenizer = None
         self.model = None
+        self._load_lock = threading.Lock()
         
     def ensure_models_loaded(self):
         """Ensure NLP models are loaded."""
-        if self.nlp is None:
-            self.nlp = get_spacy_model()
-        if self.tokenizer is None or self.model is None:
-            self.tokenizer, self.model = get_biobert_model()
+        if self.nlp is not None and self.model is not None:
+            return
+        # Startup preload and request threads may race here
+        with self._load_lock:
+            if self.nlp is None:
+                self.nlp = get_spacy_model()
+            if self.tokenizer is None or self.model is None:
+                self.tokenizer, self.model = get_biobert_model()
+    
+    def extract_entities(self, text: str, text_lower: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Extract named entities from clinical text.
+
+        ``text_lower`` may be passed when the caller already lower-cased the
+        text, so negation checks don't allocate another copy.
+        """
+        return [ent.to_dict() for ent in self._extract_entities(text, text_lower)]
     
-    def extract_entities(self, text: str) -> List[Dict[str, Any]]:
-        """Extract named entities from clinical text."""
+    def _extract_entities(self, text: str, text_lower: Optional[str] = None) -> List[Entity]:
+        """Extract and deduplicate entities as ``Entity`` objects."""
         self.ensure_models_loaded()
         
+        if text_lower is None:
+            text_lower = text.lower()
+        
         entities = []
         
         # Use spaCy for general NER
         if self.nlp:
             doc = self.nlp(text)
             for ent in doc.ents:
-                entities.append({
-                    "entity_type": ent.label_,
-                    "entity_text": ent.text,
-                    "start_position": ent.start_char,
-                    "end_position": ent.end_char,
-                    "confidence": 0.85,  # spaCy doesn't provide confidence
-                    "source": "spacy"
-                })
+                entities.append(Entity(
+                    ent.label_, ent.text, ent.start_char, ent.end_char,
+                    0.85,  # spaCy doesn't provide confidence
+                    "spacy"
+                ))
         
         # Extract medications using patterns
-        for pattern in MEDICATION_PATTERNS:
-            for match in re.finditer(pattern, text, re.IGNORECASE):
-                entities.append({
-                    "entity_type": "MEDICATION",
-                    "entity_text": match.group(),
-                    "start_position": match.start(),
-                    "end_position": match.end(),
-                    "confidence": 0.75,
-                    "source": "pattern"
-                })
+        for regex in MEDICATION_REGEXES:
+            for match in regex.finditer(text):
+                entities.append(Entity(
+                    "MEDICATION", match.group(), match.start(), match.end(),
+                    0.75, "pattern"
+                ))
         
         # Extract symptoms using patterns
-        for pattern in SYMPTOM_PATTERNS:
-            for match in re.finditer(pattern, text, re.IGNORECASE):
+        negation_spans = self._scan_negations(text_lower)
+        for regex in SYMPTOM_REGEXES:
+            for match in regex.finditer(text):
                 # Check for negation
-                is_negated = self._check_negation(text, match.start())
-                entities.append({
-                    "entity_type": "SYMPTOM",
-                    "entity_text": match.group(),
-                    "start_position": match.start(),
-                    "end_position": match.end(),
-                    "confidence": 0.7,
-                    "negated": is_negated,
-                    "source": "pattern"
-                })
+                is_negated = self._check_negation(negation_spans, match.start())
+                entities.append(Entity(
+                    "SYMPTOM", match.group(), match.start(), match.end(),
+                    0.7, "pattern", negated=is_negated
+                ))
         
         # Deduplicate entities
         seen = set()
         unique_entities = []
         for ent in entities:
-            key = (ent["entity_text"].lower(), ent["entity_type"])
+            key = (ent.entity_text.lower(), ent.entity_type)
             if key not in seen:
                 seen.add(key)
                 unique_entities.append(ent)
         
         return unique_entities
     
-    def _check_negation(self, text: str, position: int) -> bool:
-        """Check if there's a negation before the given position."""
-        # Look at 50 characters before the position
-        start = max(0, position - 50)
-        context = text[start:position].lower()
-        
-        for pattern in NEGATION_PATTERNS:
-            if re.search(pattern, context):
-                return True
-        return False
+    def _scan_negations(self, text_lower: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Find all negation cues in one pass; returns sorted (starts, ends)."""
+        spans = [m.span() for m in NEGATION_RX.finditer(text_lower)]
+        if not spans:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty
+        arr = np.asarray(spans, dtype=np.int64)
+        return arr[:, 0], arr[:, 1]
+    
+    def _check_negation(
+        self,
+        negation_spans: Tuple[np.ndarray, np.ndarray],
+        position: int
+    ) -> bool:
+        """Check if there's a negation cue in the 50 characters before position."""
+        starts, ends = negation_spans
+        # Last cue that ends at or before the position
+        idx = int(np.searchsorted(ends, position, side="right"))
+        if idx == 0:
+            return False
+        return bool(starts[idx - 1] >= position - NEGATION_WINDOW)
     
     def compute_sentiment(self, text: str) -> float:
         """Compute sentiment score for clinical text."""
         self.ensure_models_loaded()
-        
-        # Simple rule-based sentiment for clinical context
-        positive_terms = ['improving', 'stable', 'resolved', 'negative', 'normal', 'good', 'well']
-        negative_terms = ['worsening', 'severe', 'critical', 'positive', 'abnormal', 'poor', 'failed']
-        
-        text_lower = text.lower()
-        
-        positive_count = sum(1 for term in positive_terms if term in text_lower)
-        negative_count = sum(1 for term in negative_terms if term in text_lower)
+        return self._compute_sentiment(text.lower())
+    
+    def _compute_sentiment(self, text_lower: str) -> float:
+        """Rule-based sentiment on already lower-cased text."""
+        positive_count = sum(1 for term in POSITIVE_TERMS if term in text_lower)
+        negative_count = sum(1 for term in NEGATIVE_TERMS if term in text_lower)
         
         total = positive_count + negative_count
         if total == 0:
@@ -175,8 +243,10 @@ class NLPService:
     
     def compute_urgency_score(self, text: str) -> float:
         """Compute urgency score (0-1) for clinical text."""
-        text_lower = text.lower()
-        
+        return self._compute_urgency_score(text.lower())
+    
+    def _compute_urgency_score(self, text_lower: str) -> float:
+        """Urgency score on already lower-cased text."""
         high_count = sum(1 for kw in URGENCY_KEYWORDS['high'] if kw in text_lower)
         medium_count = sum(1 for kw in URGENCY_KEYWORDS['medium'] if kw in text_lower)
         low_count = sum(1 for kw in URGENCY_KEYWORDS['low'] if kw in text_lower)
@@ -218,25 +288,27 @@ class NLPService:
     def count_medication_mentions(self, text: str) -> int:
         """Count medication mentions in text."""
         count = 0
-        for pattern in MEDICATION_PATTERNS:
-            count += len(re.findall(pattern, text, re.IGNORECASE))
+        for regex in MEDICATION_REGEXES:
+            count += len(regex.findall(text))
         return count
     
     def count_symptom_mentions(self, text: str) -> int:
         """Count symptom mentions in text."""
         count = 0
-        for pattern in SYMPTOM_PATTERNS:
-            count += len(re.findall(pattern, text, re.IGNORECASE))
+        for regex in SYMPTOM_REGEXES:
+            count += len(regex.findall(text))
         return count
     
     def analyze_text(self, text: str) -> Dict[str, Any]:
         """Perform full NLP analysis on clinical text."""
-        entities = self.extract_entities(text)
+        # Lower-case once and share it across the keyword/negation passes
+        text_lower = text.lower()
+        entities = self.extract_entities(text, text_lower)
         
         return {
             "entities": entities,
-            "sentiment_score": self.compute_sentiment(text),
-            "urgency_score": self.compute_urgency_score(text),
+            "sentiment_score": self._compute_sentiment(text_lower),
+            "urgency_score": self._compute_urgency_score(text_lower),
             "complexity_score": self.compute_complexity_score(text),
             "medication_mentions": self.count_medication_mentions(text),
             "symptom_mentions": self.count_symptom_mentions(text)
@@ -252,12 +324,12 @@ class NLPService:
         try:
             import torch
             
+            # Single input: no padding/collation needed
             inputs = self.tokenizer(
                 text, 
                 return_tensors="pt", 
                 truncation=True, 
-                max_length=512,
-                padding=True
+                max_length=512
             )
             
             with torch.no_grad():
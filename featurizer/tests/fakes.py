@@ -0,0 +1,71 @@
+"""
+Lightweight stand-ins for a SQLAlchemy session in unit tests.
+
+FakeSession.query(Model) returns a FakeQuery over the rows registered for
+that model; filter/order_by/limit are accepted and ignored. Querying several
+entities, as in query(A, B).outerjoin(B, ...), yields (a, b) tuples pairing
+each A row with the first registered B row, or None.
+"""
+
+
+class FakeQuery:
+    """Query returning a fixed list of rows."""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def filter(self, *_, **__):
+        return self
+
+    def outerjoin(self, *_, **__):
+        return self
+
+    def order_by(self, *_):
+        return self
+
+    def limit(self, *_):
+        return self
+
+    def all(self):
+        return list(self.rows)
+
+    def first(self):
+        return self.rows[0] if self.rows else None
+
+    def scalar(self):
+        return self.rows[0] if self.rows else None
+
+
+class FakeSession:
+    """Session mapping queried entities to canned rows and recording writes."""
+
+    def __init__(self, mapping=None):
+        self.mapping = mapping or {}
+        self.added = []
+        self.executed = []
+        self.commits = 0
+        self.expire_on_commit = True
+
+    def query(self, entity, *joined):
+        rows = self.mapping.get(entity, [])
+        if joined:
+            extra = tuple(
+                next(iter(self.mapping.get(other, [])), None) for other in joined
+            )
+            rows = [(row,) + extra for row in rows]
+        return FakeQuery(rows)
+
+    def add(self, obj):
+        self.added.append(obj)
+
+    def execute(self, statement, params=None):
+        self.executed.append((statement, params))
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+    def refresh(self, _):
+        pass
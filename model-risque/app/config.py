@@ -1,7 +1,7 @@
 """Configuration settings for ModelRisque service."""
 from pydantic_settings import BaseSettings
-from functools import lru_cache
-from typing import List
+from typing import Dict, Tuple
+import numpy as np
 
 
 class Settings(BaseSettings):
@@ -14,18 +14,38 @@ class Settings(BaseSettings):
     service_name: str = "model-risque"
     service_host: str = "0.0.0.0"
     service_port: int = 8084
+    service_workers: int = 1
     debug: bool = False
     
     # Model settings
     model_path: str = "./models/readmission_model.pkl"
     model_version: str = "v2.1.0"
     
+    # Rows in the per-thread inference input buffer; larger batches allocate
+    max_batch_size: int = 1000
+    
+    # Prediction threads for XGBoost; 0 means one per CPU core
+    xgb_nthread: int = 0
+    
+    # Optional ONNX Runtime inference (requires onnxruntime; the model is
+    # exported with onnxmltools on first use if the file does not exist)
+    use_onnx: bool = False
+    onnx_model_path: str = "./models/readmission_model.onnx"
+    
+    # Optional Treelite-compiled model for single-row predictions (requires
+    # treelite/treelite_runtime and a C toolchain to build the library)
+    use_treelite: bool = False
+    
+    # Return predictions before SHAP is computed; explanations are filled in
+    # by a background thread and served from the explanation endpoint
+    async_shap: bool = False
+    
     # Risk thresholds
     risk_threshold_high: float = 0.7
     risk_threshold_medium: float = 0.4
     
     # Feature columns for model
-    feature_columns: List[str] = [
+    feature_columns: Tuple[str, ...] = (
         "age_at_admission",
         "gender_encoded",
         "length_of_stay",
@@ -58,7 +78,7 @@ class Settings(BaseSettings):
         "medication_count",
         "procedure_count",
         "discharge_to_home"
-    ]
+    )
     
     # Featurizer service URL
     featurizer_service_url: str = "http://localhost:8083"
@@ -71,8 +91,18 @@ class Settings(BaseSettings):
         case_sensitive = False
 
 
-@lru_cache()
+# Module-level singleton; import it directly in hot paths
+settings = Settings()
+
+
 def get_settings() -> Settings:
-    """Get cached settings instance."""
-    return Settings()
+    """Get the settings instance (kept for dependency-injection call sites)."""
+    return settings
+
 
+# Column lookups built once at import: name -> position, and an object array
+# so SHAP indices can be mapped to names with fancy indexing.
+FEATURE_INDEX: Dict[str, int] = {
+    name: i for i, name in enumerate(settings.feature_columns)
+}
+FEATURE_ARRAY = np.array(settings.feature_columns, dtype=object)
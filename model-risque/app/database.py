@@ -3,9 +3,8 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from sqlalchemy.pool import QueuePool
 
-from app.config import get_settings
+from app.config import settings
 
-settings = get_settings()
 
 engine = create_engine(
     settings.database_url,
@@ -1,33 +1,49 @@
 """Main FastAPI application for ModelRisque service."""
+import time
 from datetime import datetime
-from typing import List
+from itertools import islice
+from typing import Any, Callable, Dict, Iterator, List, Tuple
 from fastapi import FastAPI, Depends, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import text
+import orjson
 import structlog
 
-from app.config import get_settings
-from app.database import get_db
+from app.config import settings
+from app.database import SessionLocal, get_db
 from app.schemas import (
     PredictionRequest, PredictionResponse,
     BatchPredictionRequest, BatchPredictionResponse,
     OutcomeUpdateRequest, ModelInfoResponse,
     ModelMetrics, PredictionStats, HealthResponse, RiskFactor
 )
-from app.model_service import ModelService, get_model
+from app.model_service import ModelService, explanation_pending, get_model, get_shap_explainer
 from prometheus_fastapi_instrumentator import Instrumentator
 
-settings = get_settings()
 logger = structlog.get_logger()
 
+# Model info/metrics only change on redeploy or new outcomes, so scrapes of
+# those endpoints are served from memory: key -> (monotonic expiry, payload)
+MODEL_CACHE_TTL_SECONDS = 60.0
+_response_cache: Dict[str, Tuple[float, Any]] = {}
+
+# Health probe cache: (monotonic timestamp, healthy)
+HEALTH_CACHE_TTL_SECONDS = 5.0
+_last_health: Tuple[float, bool] = (0.0, False)
+
+# High-risk rows read per server-side cursor fetch and per streamed chunk
+HIGH_RISK_CHUNK_SIZE = 500
+
 # Create FastAPI app
 app = FastAPI(
     title="ModelRisque Service",
     description="Risk Prediction Service for HealthFlow-MS - XGBoost with SHAP explanations",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=ORJSONResponse
 )
 
 # Initialize Prometheus metrics BEFORE middlewares
@@ -54,17 +70,54 @@ async def startup_event():
         logger.info("Model loaded successfully", model_type=type(model).__name__)
     except Exception as e:
         logger.error(f"Could not load model: {e}")
+    
+    # Pre-build the SHAP explainer so the first prediction doesn't pay for it
+    try:
+        get_shap_explainer()
+    except Exception as e:
+        logger.error(f"Could not create SHAP explainer: {e}")
 
 
-@app.get("/health", response_model=HealthResponse, tags=["Health"])
-async def health_check(db: Session = Depends(get_db)):
-    """Health check endpoint."""
+def get_model_service(db: Session = Depends(get_db)) -> ModelService:
+    """Dependency providing a ModelService bound to the request's session."""
+    return ModelService(db)
+
+
+def _cached_response(key: str, loader: Callable[[], Any]) -> Any:
+    """Return the cached payload for key, reloading it once the TTL expires."""
+    now = time.monotonic()
+    entry = _response_cache.get(key)
+    if entry is not None and entry[0] > now:
+        return entry[1]
+    
+    payload = loader()
+    _response_cache[key] = (now + MODEL_CACHE_TTL_SECONDS, payload)
+    return payload
+
+
+def _probe_health(db: Session) -> bool:
+    """Check database and model at most once per TTL; probes in between reuse the result."""
+    global _last_health
+    checked_at, healthy = _last_health
+    now = time.monotonic()
+    if now - checked_at < HEALTH_CACHE_TTL_SECONDS:
+        return healthy
+    
     try:
         db.execute(text("SELECT 1"))
         model = get_model()
-        model_loaded = model is not None
+        healthy = model is not None
     except Exception:
-        model_loaded = False
+        healthy = False
+    
+    _last_health = (now, healthy)
+    return healthy
+
+
+@app.get("/health", response_model=HealthResponse, tags=["Health"])
+def health_check(db: Session = Depends(get_db)):
+    """Health check endpoint (a plain def, so the probe runs in the threadpool)."""
+    model_loaded = _probe_health(db)
     
     return HealthResponse(
         status="UP" if model_loaded else "DEGRADED",
@@ -78,14 +131,13 @@ async def health_check(db: Session = Depends(get_db)):
 @app.post("/api/predict", response_model=PredictionResponse, tags=["Predictions"])
 async def predict(
     request: PredictionRequest,
-    db: Session = Depends(get_db)
+    service: ModelService = Depends(get_model_service)
 ):
     """
     Make a risk prediction for a patient.
     
     Returns risk score (0-1), risk level (HIGH/MEDIUM/LOW), and SHAP explanations.
     """
-    service = ModelService(db)
     
     prediction = service.predict(
         request.pseudo_patient_id,
@@ -106,7 +158,7 @@ async def predict(
         risk_level=prediction.risk_level,
         confidence_interval=[prediction.confidence_lower, prediction.confidence_upper],
         top_risk_factors=[
-            RiskFactor(**factor) for factor in prediction.top_risk_factors
+            RiskFactor.model_construct(**factor) for factor in prediction.top_risk_factors
         ] if prediction.top_risk_factors else [],
         prediction_timestamp=prediction.prediction_timestamp,
         model_version=settings.model_version,
@@ -117,29 +169,27 @@ async def predict(
 @app.post("/api/predict/batch", response_model=BatchPredictionResponse, tags=["Predictions"])
 async def batch_predict(
     request: BatchPredictionRequest,
-    db: Session = Depends(get_db)
+    service: ModelService = Depends(get_model_service)
 ):
     """
     Make predictions for multiple patients.
     """
-    service = ModelService(db)
     result = service.batch_predict(request.pseudo_patient_ids)
     
-    predictions = []
-    for pred in result["predictions"]:
-        predictions.append(PredictionResponse(
-            pseudo_patient_id=pred.pseudo_patient_id,
-            encounter_id=pred.encounter_id,
-            risk_score=pred.risk_score,
-            risk_level=pred.risk_level,
-            confidence_interval=[pred.confidence_lower, pred.confidence_upper],
-            top_risk_factors=[
-                RiskFactor(**factor) for factor in pred.top_risk_factors
-            ] if pred.top_risk_factors else [],
-            prediction_timestamp=pred.prediction_timestamp,
-            model_version=settings.model_version,
-            prediction_horizon_days=pred.prediction_horizon_days
-        ))
+    # Predictions come straight from ModelService, so skip re-validation
+    predictions = [
+        PredictionResponse.model_construct(
+            **{
+                **pred,
+                "top_risk_factors": [
+                    RiskFactor.model_construct(**factor)
+                    for factor in pred["top_risk_factors"]
+                ]
+            },
+            model_version=settings.model_version
+        )
+        for pred in result["predictions"]
+    ]
     
     return BatchPredictionResponse(
         total_processed=result["total_processed"],
@@ -153,12 +203,11 @@ async def batch_predict(
 @app.get("/api/predict/{pseudo_patient_id}", response_model=PredictionResponse, tags=["Predictions"])
 async def get_prediction(
     pseudo_patient_id: str,
-    db: Session = Depends(get_db)
+    service: ModelService = Depends(get_model_service)
 ):
     """
     Get the latest prediction for a patient.
     """
-    service = ModelService(db)
     prediction = service.get_prediction(pseudo_patient_id)
     
     if not prediction:
@@ -174,7 +223,7 @@ async def get_prediction(
         risk_level=prediction.risk_level,
         confidence_interval=[prediction.confidence_lower, prediction.confidence_upper],
         top_risk_factors=[
-            RiskFactor(**factor) for factor in prediction.top_risk_factors
+            RiskFactor.model_construct(**factor) for factor in prediction.top_risk_factors
         ] if prediction.top_risk_factors else [],
         prediction_timestamp=prediction.prediction_timestamp,
         model_version=settings.model_version,
@@ -183,14 +232,17 @@ async def get_prediction(
 
 
 @app.get("/api/predict/{pseudo_patient_id}/explanation", tags=["Predictions"])
-async def get_explanation(
+def get_explanation(
     pseudo_patient_id: str,
-    db: Session = Depends(get_db)
+    service: ModelService = Depends(get_model_service)
 ):
     """
     Get detailed SHAP explanation for a patient's prediction.
+    
+    Returns 202 while a background SHAP job (ASYNC_SHAP) is still running.
+    A prediction left without SHAP values is explained on this read; 503 if
+    that still fails.
     """
-    service = ModelService(db)
     prediction = service.get_prediction(pseudo_patient_id)
     
     if not prediction:
@@ -199,6 +251,19 @@ async def get_explanation(
             detail=f"No prediction found for patient {pseudo_patient_id}"
         )
     
+    if not prediction.shap_values:
+        if explanation_pending(prediction.id):
+            return ORJSONResponse(
+                status_code=status.HTTP_202_ACCEPTED,
+                content={"pseudo_patient_id": pseudo_patient_id, "status": "pending"}
+            )
+        prediction = service.explain_prediction(prediction)
+        if not prediction.shap_values:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=f"Explanation unavailable for patient {pseudo_patient_id}"
+            )
+    
     return {
         "pseudo_patient_id": prediction.pseudo_patient_id,
         "risk_score": prediction.risk_score,
@@ -211,12 +276,11 @@ async def get_explanation(
 @app.put("/api/outcome", tags=["Outcomes"])
 async def update_outcome(
     request: OutcomeUpdateRequest,
-    db: Session = Depends(get_db)
+    service: ModelService = Depends(get_model_service)
 ):
     """
     Update actual outcome for a patient (for model monitoring).
     """
-    service = ModelService(db)
     success = service.update_outcome(
         request.pseudo_patient_id,
         request.actual_readmission,
@@ -233,38 +297,94 @@ async def update_outcome(
 
 
 @app.get("/api/high-risk", tags=["Predictions"])
-async def get_high_risk_patients(
+def get_high_risk_patients(
     threshold: float = None,
-    limit: int = 100,
-    db: Session = Depends(get_db)
+    limit: int = 100
 ):
     """
     Get list of high-risk patients.
+    
+    The first chunk of rows is read before any response is started, so a
+    failing query still returns a proper error. Lists that fit in one chunk
+    are returned as a plain document; larger ones are streamed chunk by chunk
+    from a server-side cursor.
     """
-    service = ModelService(db)
-    patients = service.get_high_risk_patients(threshold, limit)
+    threshold = threshold or settings.risk_threshold_high
+    # The streamed body outlives the request dependencies, so it owns its session
+    db = SessionLocal()
+    try:
+        rows = ModelService(db).iter_high_risk_patients(
+            threshold, limit, chunk_size=HIGH_RISK_CHUNK_SIZE
+        )
+        first = list(islice(rows, HIGH_RISK_CHUNK_SIZE))
+    except Exception:
+        db.close()
+        raise
+    
+    if len(first) < HIGH_RISK_CHUNK_SIZE:
+        db.close()
+        return {
+            "threshold": threshold,
+            "count": len(first),
+            "patients": [_high_risk_entry(row) for row in first]
+        }
     
+    return StreamingResponse(
+        _stream_high_risk_patients(db, threshold, first, rows),
+        media_type="application/json"
+    )
+
+
+def _high_risk_entry(row: Tuple[str, float, str, datetime]) -> Dict[str, Any]:
+    """Build the JSON entry for one high-risk row."""
+    pseudo_patient_id, risk_score, risk_level, timestamp = row
     return {
-        "threshold": threshold or settings.risk_threshold_high,
-        "count": len(patients),
-        "patients": [
-            {
-                "pseudo_patient_id": p.pseudo_patient_id,
-                "risk_score": p.risk_score,
-                "risk_level": p.risk_level,
-                "prediction_timestamp": p.prediction_timestamp
-            }
-            for p in patients
-        ]
+        "pseudo_patient_id": pseudo_patient_id,
+        "risk_score": risk_score,
+        "risk_level": risk_level,
+        "prediction_timestamp": timestamp
     }
 
 
+def _stream_high_risk_patients(
+    db: Session,
+    threshold: float,
+    first: List[Tuple[str, float, str, datetime]],
+    rows: Iterator[Tuple[str, float, str, datetime]]
+) -> Iterator[bytes]:
+    """Yield the high-risk JSON document one chunk of rows at a time."""
+    try:
+        # Each yield costs a threadpool hop, so rows are batched per chunk
+        yield (
+            b'{"threshold":' + orjson.dumps(threshold) + b',"patients":['
+            + orjson.dumps([_high_risk_entry(row) for row in first])[1:-1]
+        )
+        count = len(first)
+        while True:
+            chunk = list(islice(rows, HIGH_RISK_CHUNK_SIZE))
+            if not chunk:
+                break
+            yield b"," + orjson.dumps([_high_risk_entry(row) for row in chunk])[1:-1]
+            count += len(chunk)
+        yield b'],"count":' + orjson.dumps(count) + b"}"
+    except Exception as e:
+        # Headers are already sent; the client sees a truncated document
+        logger.error("High-risk stream failed", error=str(e))
+        raise
+    finally:
+        db.close()
+
+
 @app.get("/api/model/info", response_model=ModelInfoResponse, tags=["Model"])
-async def get_model_info(db: Session = Depends(get_db)):
+async def get_model_info(service: ModelService = Depends(get_model_service)):
     """
     Get information about the active model.
     """
-    service = ModelService(db)
+    return _cached_response("info", lambda: _build_model_info(service))
+
+
+def _build_model_info(service: ModelService) -> ModelInfoResponse:
+    """Build the model info response from the active model record."""
     model_info = service.get_model_info()
     
     if not model_info:
@@ -295,24 +415,29 @@ async def get_model_info(db: Session = Depends(get_db)):
 
 
 @app.get("/api/model/metrics", response_model=ModelMetrics, tags=["Model"])
-async def get_model_metrics(db: Session = Depends(get_db)):
+async def get_model_metrics(service: ModelService = Depends(get_model_service)):
     """
     Get model performance metrics.
     """
-    service = ModelService(db)
-    return service.get_model_metrics()
+    return _cached_response("metrics", service.get_model_metrics)
 
 
 @app.get("/api/stats", response_model=PredictionStats, tags=["Statistics"])
-async def get_stats(db: Session = Depends(get_db)):
+async def get_stats(service: ModelService = Depends(get_model_service)):
     """
     Get prediction statistics.
     """
-    service = ModelService(db)
     return service.get_stats()
 
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host=settings.service_host, port=settings.service_port)
+    uvicorn.run(
+        "app.main:app",
+        host=settings.service_host,
+        port=settings.service_port,
+        loop="uvloop",
+        http="httptools",
+        workers=settings.service_workers
+    )
 
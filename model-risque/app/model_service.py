@@ -1,24 +1,124 @@
 """Risk prediction model service."""
 import os
+import sys
+import itertools
 import json
-from datetime import datetime
-from typing import Optional, Dict, Any, List, Tuple
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import Optional, Dict, Any, Iterator, List, NamedTuple, Tuple
 import numpy as np
 import pandas as pd
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, insert, select
 import structlog
 import joblib
+from prometheus_client import Histogram
 
-from app.config import get_settings
+from app.config import settings, FEATURE_ARRAY
 from app.models import MLModel, RiskPrediction, PatientFeatures
 
-settings = get_settings()
 logger = structlog.get_logger()
 
+# Model inference latency; buckets focus on the sub-100ms range
+PREDICT_LATENCY = Histogram(
+    "xgb_predict_seconds",
+    "Time spent scoring feature rows with the risk model",
+    buckets=(.001, .002, .005, .01, .025, .05, .1, .25)
+)
+
+# Risk level labels indexed by np.digitize over (medium, high) thresholds
+RISK_LEVELS = np.array(["LOW", "MEDIUM", "HIGH"])
+
 # Global model cache
 _model = None
 _explainer = None
+_onnx_session = None
+_onnx_unavailable = False
+_treelite_predictor = None
+_treelite_unavailable = False
+
+class PredictionSnapshot(NamedTuple):
+    """Columns of a stored prediction read by the prediction endpoints."""
+    id: Any
+    pseudo_patient_id: str
+    encounter_id: Optional[str]
+    risk_score: float
+    risk_level: str
+    confidence_lower: Optional[float]
+    confidence_upper: Optional[float]
+    shap_values: Optional[Dict[str, float]]
+    top_risk_factors: Optional[List[Dict[str, Any]]]
+    prediction_timestamp: Optional[datetime]
+    prediction_horizon_days: Optional[int]
+
+
+# Recently read predictions: pseudo_patient_id -> (monotonic expiry, snapshot).
+# Dashboards re-poll the same patients; entries are dropped whenever a new
+# prediction or outcome is written for that patient. Plain snapshots are
+# cached rather than ORM rows, which belong to the session that loaded them.
+PREDICTION_CACHE_TTL_SECONDS = 30.0
+PREDICTION_CACHE_MAX_SIZE = 10_000
+_prediction_cache: "OrderedDict[str, Tuple[float, PredictionSnapshot]]" = OrderedDict()
+_prediction_cache_lock = threading.Lock()
+
+
+def invalidate_predictions(pseudo_patient_ids) -> None:
+    """Drop cached predictions for the given patients."""
+    with _prediction_cache_lock:
+        for pid in pseudo_patient_ids:
+            _prediction_cache.pop(pid, None)
+
+
+# Model outputs per feature version: (pseudo_patient_id, computed_at) ->
+# (risk_score, top_factors, shap_values). Features are immutable once
+# computed, so an entry stays valid until a newer feature row appears.
+SCORE_CACHE_MAX_SIZE = 8192
+_score_cache: "OrderedDict[Tuple[str, datetime], Tuple[float, List[Dict], np.ndarray]]" = OrderedDict()
+_score_cache_lock = threading.Lock()
+
+
+# Active MLModel id, refreshed at most once per TTL instead of per prediction
+ACTIVE_MODEL_TTL_SECONDS = 60.0
+_active_model_id = None
+_active_model_ts = 0.0
+_active_model_lock = threading.Lock()
+
+
+# Background SHAP workers used when ASYNC_SHAP is enabled, and the ids of
+# predictions queued or running there. A prediction with empty SHAP values
+# that is not in flight has no explanation coming and is recomputed on read.
+_shap_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="shap")
+_shap_in_flight = set()
+_shap_in_flight_lock = threading.Lock()
+
+
+def explanation_pending(prediction_id) -> bool:
+    """Whether a background SHAP job for the prediction is queued or running."""
+    with _shap_in_flight_lock:
+        return prediction_id in _shap_in_flight
+
+
+# Per-thread (max_batch_size, F) input buffer for inference; FastAPI runs
+# sync endpoints on a thread pool, so the buffer must not be shared.
+_thread_local = threading.local()
+
+
+def _feature_buffer(rows: int = 1) -> np.ndarray:
+    """Get a C-contiguous (rows, F) float32 view of the thread's input buffer.
+
+    Batches larger than ``max_batch_size`` get a fresh array instead.
+    """
+    n_features = len(settings.feature_columns)
+    if rows > settings.max_batch_size:
+        return np.empty((rows, n_features), dtype=np.float32)
+    buf = getattr(_thread_local, "feature_buffer", None)
+    if buf is None:
+        buf = np.empty((settings.max_batch_size, n_features), dtype=np.float32)
+        _thread_local.feature_buffer = buf
+    return buf[:rows]
 
 
 def get_model():
@@ -26,15 +126,40 @@ def get_model():
     global _model
     if _model is None:
         _model = _load_or_create_model()
+        _configure_threads(_model)
     return _model
 
 
+def _configure_threads(model):
+    """Let XGBoost prediction use all configured cores (XGB_NTHREAD)."""
+    nthread = settings.xgb_nthread or os.cpu_count() or 1
+    try:
+        model.get_booster().set_param({"nthread": nthread})
+        logger.info("XGBoost threads configured", nthread=nthread)
+    except Exception as e:
+        logger.warning("Could not configure XGBoost threads", error=str(e))
+
+
 def _load_or_create_model():
     """Load existing model or create a new one."""
     model_path = settings.model_path
+    native_path = model_path + ".ubj"
+    
+    # Prefer XGBoost's native format: parsed in C++, no pickle involved
+    if os.path.exists(native_path):
+        try:
+            from xgboost import XGBClassifier
+            model = XGBClassifier()
+            model.load_model(native_path)
+            logger.info("Model loaded from disk", path=native_path)
+            return model
+        except Exception as e:
+            logger.error("Error loading native model", error=str(e))
     
     if os.path.exists(model_path):
         try:
+            # The pickled booster is a raw byte blob that XGBoost parses into
+            # its own heap, so each worker process holds a private copy
             model = joblib.load(model_path)
             logger.info("Model loaded from disk", path=model_path)
             return model
@@ -88,55 +213,194 @@ def _create_default_model():
     # Save the model
     os.makedirs(os.path.dirname(settings.model_path), exist_ok=True)
     joblib.dump(model, settings.model_path)
+    model.save_model(settings.model_path + ".ubj")
     logger.info("Default model created and saved", path=settings.model_path)
     
     return model
 
 
+def _export_onnx(model):
+    """Convert the XGBoost model to ONNX next to the pickle (needs onnxmltools)."""
+    from onnxmltools.convert import convert_xgboost
+    from onnxmltools.convert.common.data_types import FloatTensorType
+    
+    onx = convert_xgboost(
+        model,
+        initial_types=[("input", FloatTensorType([None, len(settings.feature_columns)]))]
+    )
+    with open(settings.onnx_model_path, "wb") as f:
+        f.write(onx.SerializeToString())
+    logger.info("ONNX model exported", path=settings.onnx_model_path)
+
+
+def get_onnx_session():
+    """Get or create the ONNX Runtime session, or None if unavailable."""
+    global _onnx_session, _onnx_unavailable
+    if _onnx_session is None and settings.use_onnx and not _onnx_unavailable:
+        try:
+            import onnxruntime as ort
+            if not os.path.exists(settings.onnx_model_path):
+                _export_onnx(get_model())
+            options = ort.SessionOptions()
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            # Requests already run concurrently; one thread per call avoids oversubscription
+            options.intra_op_num_threads = 1
+            _onnx_session = ort.InferenceSession(
+                settings.onnx_model_path,
+                sess_options=options,
+                providers=["CPUExecutionProvider"]
+            )
+            logger.info("ONNX model loaded", path=settings.onnx_model_path)
+        except Exception as e:
+            logger.warning("ONNX model unavailable, using XGBoost", error=str(e))
+            _onnx_unavailable = True
+    return _onnx_session
+
+
+def get_treelite_predictor():
+    """Get the Treelite predictor for single rows, compiling it on first use."""
+    global _treelite_predictor, _treelite_unavailable
+    if _treelite_predictor is None and settings.use_treelite and not _treelite_unavailable:
+        try:
+            import treelite
+            import treelite_runtime
+            libpath = settings.model_path + ".so"
+            if not os.path.exists(libpath):
+                tl_model = treelite.Model.from_xgboost(get_model().get_booster())
+                tl_model.export_lib(
+                    toolchain="gcc", libpath=libpath,
+                    params={"parallel_comp": 8}, verbose=False
+                )
+            # One thread: a single row gains nothing from OpenMP fan-out
+            _treelite_predictor = treelite_runtime.Predictor(libpath, nthread=1)
+            logger.info("Treelite predictor loaded", path=libpath)
+        except Exception as e:
+            logger.warning("Treelite predictor unavailable, using XGBoost", error=str(e))
+            _treelite_unavailable = True
+    return _treelite_predictor
+
+
 def get_shap_explainer():
     """Get or create SHAP explainer."""
     global _explainer
     if _explainer is None:
-        import shap
         model = get_model()
-        _explainer = shap.TreeExplainer(model)
-        logger.info("SHAP explainer created")
+        # Path-dependent Tree SHAP needs no background data; values are in
+        # log-odds, and top factors only use their sign and magnitude
+        options = {"feature_perturbation": "tree_path_dependent", "model_output": "raw"}
+        try:
+            # Same API and values as shap.TreeExplainer, faster on large batches
+            import fasttreeshap
+            _explainer = fasttreeshap.TreeExplainer(model, algorithm="auto", n_jobs=-1, **options)
+        except ImportError:
+            import shap
+            _explainer = shap.TreeExplainer(model, **options)
+        logger.info("SHAP explainer created", explainer=type(_explainer).__module__)
     return _explainer
 
 
+def _cache_score(key: Tuple[str, datetime], result: Tuple[float, List[Dict], np.ndarray]) -> None:
+    """Store a scored and explained feature row in the score cache."""
+    if key[1] is None:
+        return
+    with _score_cache_lock:
+        _score_cache[key] = result
+        if len(_score_cache) > SCORE_CACHE_MAX_SIZE:
+            _score_cache.popitem(last=False)
+
+
+def _explain_prediction(
+    prediction_id,
+    pseudo_patient_id: str,
+    computed_at: Optional[datetime],
+    risk_score: float,
+    features: np.ndarray
+) -> None:
+    """Compute SHAP for a stored prediction and write it back (background task)."""
+    from app.database import SessionLocal
+    
+    try:
+        with SessionLocal() as db:
+            service = ModelService(db)
+            top_factors, shap_values = service.calculate_shap_values(features)
+            if len(shap_values) == 0:
+                logger.error("Background SHAP produced no values", prediction_id=str(prediction_id))
+                return
+            service._store_explanation(prediction_id, top_factors, shap_values)
+        
+        _cache_score(
+            (sys.intern(pseudo_patient_id), computed_at),
+            (risk_score, top_factors, shap_values)
+        )
+        invalidate_predictions([pseudo_patient_id])
+    except Exception as e:
+        logger.error("Background SHAP failed", prediction_id=str(prediction_id), error=str(e))
+    finally:
+        with _shap_in_flight_lock:
+            _shap_in_flight.discard(prediction_id)
+
+
 class ModelService:
-    """Service for risk prediction using XGBoost model."""
+    """Service for risk prediction using XGBoost model.
+
+    Holds only the request's session and a reference to the process-wide
+    model; everything else is shared at class or module level, so building
+    one per request is cheap.
+    """
+    
+    feature_columns = settings.feature_columns
+    _feature_attrs = tuple(getattr(PatientFeatures, col) for col in feature_columns)
     
     def __init__(self, db: Session):
         self.db = db
         self.model = get_model()
-        self.feature_columns = settings.feature_columns
     
-    def get_features_for_patient(self, pseudo_patient_id: str) -> Optional[Dict[str, Any]]:
-        """Get features for a patient from the database."""
-        features = self.db.query(PatientFeatures).filter(
+    def _get_active_model_id(self):
+        """Id of the active MLModel, cached for ACTIVE_MODEL_TTL_SECONDS."""
+        global _active_model_id, _active_model_ts
+        if time.monotonic() - _active_model_ts < ACTIVE_MODEL_TTL_SECONDS:
+            return _active_model_id
+        with _active_model_lock:
+            # Another thread may have refreshed while we waited
+            if time.monotonic() - _active_model_ts >= ACTIVE_MODEL_TTL_SECONDS:
+                _active_model_id = self.db.query(MLModel.id).filter(
+                    MLModel.is_active == True
+                ).limit(1).scalar()
+                _active_model_ts = time.monotonic()
+            return _active_model_id
+    
+    @classmethod
+    def invalidate_active_model_cache(cls) -> None:
+        """Force the next prediction to re-read the active model (call after activation changes)."""
+        global _active_model_ts
+        with _active_model_lock:
+            _active_model_ts = 0.0
+    
+    def _fetch_feature_row(self, pseudo_patient_id: str) -> Optional[Tuple]:
+        """Latest feature values for a patient as a bare tuple, in column order.
+
+        The row's computed_at is appended as the last element.
+        """
+        return self.db.query(*self._feature_attrs, PatientFeatures.computed_at).filter(
             PatientFeatures.pseudo_patient_id == pseudo_patient_id
         ).order_by(PatientFeatures.computed_at.desc()).first()
+    
+    def get_features_for_patient(self, pseudo_patient_id: str) -> Optional[Dict[str, Any]]:
+        """Get features for a patient from the database."""
+        row = self._fetch_feature_row(pseudo_patient_id)
         
-        if not features:
+        if row is None:
             return None
         
-        # Convert to dict
-        feature_dict = {}
-        for col in self.feature_columns:
-            value = getattr(features, col, None)
-            if value is None:
-                value = 0
-            elif isinstance(value, bool):
-                value = int(value)
-            feature_dict[col] = value
-        
-        return feature_dict
+        return {
+            col: 0 if value is None else int(value) if isinstance(value, bool) else value
+            for col, value in zip(self.feature_columns, row)
+        }
     
     def prepare_features(self, feature_dict: Dict[str, Any]) -> np.ndarray:
         """Prepare features for model input."""
         feature_values = [feature_dict.get(col, 0) for col in self.feature_columns]
-        return np.array([feature_values])
+        return np.array([feature_values], dtype=np.float32)
     
     def calculate_confidence_interval(
         self, 
@@ -158,41 +422,116 @@ class ModelService:
             return "MEDIUM"
         return "LOW"
     
+    def get_risk_levels(self, risk_scores: np.ndarray) -> np.ndarray:
+        """Determine risk levels for an array of scores."""
+        bins = (settings.risk_threshold_medium, settings.risk_threshold_high)
+        return RISK_LEVELS[np.digitize(risk_scores, bins)]
+    
+    def _classify_batch(
+        self,
+        risk_scores: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Risk levels and confidence bounds for an array of scores.
+
+        Same math as get_risk_level and calculate_confidence_interval, done
+        as whole-array ufuncs instead of per-row Python calls.
+        """
+        margin = 0.1 * (1 - np.abs(risk_scores - 0.5) * 2)
+        lower = np.maximum(0, risk_scores - margin)
+        upper = np.minimum(1, risk_scores + margin)
+        return self.get_risk_levels(risk_scores), lower, upper
+    
     def calculate_shap_values(
         self, 
         features: np.ndarray
     ) -> Tuple[List[Dict], np.ndarray]:
-        """Calculate SHAP values for feature importance."""
-        try:
-            explainer = get_shap_explainer()
-            shap_values = explainer.shap_values(features)
-            
-            # Handle different SHAP output formats
-            if isinstance(shap_values, list):
-                shap_values = shap_values[1]  # For binary classification
-            
-            # Create top risk factors
-            top_factors = []
-            shap_flat = shap_values.flatten()
-            feature_values = features.flatten()
-            
-            # Get indices sorted by absolute SHAP value
-            sorted_indices = np.argsort(np.abs(shap_flat))[::-1]
-            
-            for idx in sorted_indices[:10]:  # Top 10 factors
-                factor = {
-                    "feature": self.feature_columns[idx],
-                    "impact": float(abs(shap_flat[idx])),
-                    "value": float(feature_values[idx]),
-                    "direction": "increases" if shap_flat[idx] > 0 else "decreases"
-                }
-                top_factors.append(factor)
-            
-            return top_factors, shap_flat
-            
-        except Exception as e:
-            logger.error("Error calculating SHAP values", error=str(e))
+        """Calculate SHAP values for feature importance of a single row."""
+        all_factors, shap_values = self.calculate_shap_values_batch(features)
+        if len(shap_values) == 0:
             return [], np.array([])
+        return all_factors[0], shap_values[0]
+    
+    def _store_explanation(
+        self,
+        prediction_id,
+        top_factors: List[Dict],
+        shap_values: np.ndarray
+    ) -> None:
+        """Write SHAP output back onto a stored prediction and commit."""
+        self.db.query(RiskPrediction).filter(RiskPrediction.id == prediction_id).update(
+            {
+                RiskPrediction.shap_values: dict(
+                    zip(self.feature_columns, shap_values.tolist())
+                ),
+                RiskPrediction.top_risk_factors: top_factors,
+            },
+            synchronize_session=False
+        )
+        self.db.commit()
+    
+    def explain_prediction(self, prediction: PredictionSnapshot) -> PredictionSnapshot:
+        """Compute and store SHAP for a prediction that has none.
+
+        Covers a failed background job and a batch whose SHAP call came back
+        empty. The patient's latest features are explained, which are the ones
+        the prediction was scored from unless newer features arrived since.
+        Returns the prediction unchanged if SHAP still cannot be computed.
+        """
+        if prediction.shap_values:
+            return prediction
+        
+        row = self._fetch_feature_row(prediction.pseudo_patient_id)
+        if row is None:
+            return prediction
+        
+        features = np.array(
+            [[0 if value is None else value for value in row[:-1]]], dtype=np.float32
+        )
+        top_factors, shap_values = self.calculate_shap_values(features)
+        if len(shap_values) == 0:
+            return prediction
+        
+        self._store_explanation(prediction.id, top_factors, shap_values)
+        invalidate_predictions([prediction.pseudo_patient_id])
+        return prediction._replace(
+            shap_values=dict(zip(self.feature_columns, shap_values.tolist())),
+            top_risk_factors=top_factors
+        )
+    
+    def _score_features(
+        self,
+        pseudo_patient_id: str,
+        computed_at: Optional[datetime],
+        values: List[Any],
+        explain: bool = True
+    ) -> Tuple[float, List[Dict], np.ndarray]:
+        """Score one feature row and explain it, reusing results per feature version.
+
+        With ``explain=False`` a cache miss is scored only and comes back with
+        empty SHAP output; nothing is cached until the explanation exists.
+        """
+        key = (sys.intern(pseudo_patient_id), computed_at)
+        if computed_at is not None:
+            with _score_cache_lock:
+                cached = _score_cache.get(key)
+                if cached is not None:
+                    _score_cache.move_to_end(key)
+                    return cached
+        
+        X = _feature_buffer()
+        X[0] = [0 if value is None else value for value in values]
+        
+        # Get prediction probability (inplace_predict skips DMatrix construction)
+        risk_score = float(self._predict_scores(X)[0])
+        if not explain:
+            return risk_score, [], np.array([])
+        
+        # Calculate SHAP explanations
+        top_factors, shap_values = self.calculate_shap_values(X)
+        
+        result = (risk_score, top_factors, shap_values)
+        _cache_score(key, result)
+        return result
     
     def predict(
         self, 
@@ -202,17 +541,17 @@ class ModelService:
     ) -> Optional[RiskPrediction]:
         """Make a risk prediction for a patient."""
         
-        # Get features
-        feature_dict = self.get_features_for_patient(pseudo_patient_id)
-        if not feature_dict:
+        # Get features straight into the model input buffer
+        row = self._fetch_feature_row(pseudo_patient_id)
+        if row is None:
             logger.warning("Features not found", patient_id=pseudo_patient_id)
             return None
         
-        # Prepare features for model
-        X = self.prepare_features(feature_dict)
-        
-        # Get prediction probability
-        risk_score = float(self.model.predict_proba(X)[0, 1])
+        *values, computed_at = row
+        risk_score, top_factors, shap_values = self._score_features(
+            pseudo_patient_id, computed_at, values, explain=not settings.async_shap
+        )
+        shap_pending = settings.async_shap and len(shap_values) == 0
         
         # Calculate confidence interval
         ci_lower, ci_upper = self.calculate_confidence_interval(risk_score)
@@ -220,27 +559,17 @@ class ModelService:
         # Get risk level
         risk_level = self.get_risk_level(risk_score)
         
-        # Calculate SHAP explanations
-        top_factors, shap_values = self.calculate_shap_values(X)
-        
-        # Get active model
-        active_model = self.db.query(MLModel).filter(
-            MLModel.is_active == True
-        ).first()
-        
         # Create prediction record
         prediction = RiskPrediction(
             pseudo_patient_id=pseudo_patient_id,
             encounter_id=encounter_id,
-            model_id=active_model.id if active_model else None,
+            model_id=self._get_active_model_id(),
             risk_score=risk_score,
             risk_level=risk_level,
             confidence_lower=ci_lower,
             confidence_upper=ci_upper,
-            shap_values={
-                col: float(val) 
-                for col, val in zip(self.feature_columns, shap_values)
-            } if len(shap_values) > 0 else {},
+            # tolist() converts to native floats in one C call
+            shap_values=dict(zip(self.feature_columns, shap_values.tolist())),
             top_risk_factors=top_factors,
             discharge_date=discharge_date,
             prediction_horizon_days=30
@@ -249,6 +578,23 @@ class ModelService:
         self.db.add(prediction)
         self.db.commit()
         self.db.refresh(prediction)
+        invalidate_predictions([pseudo_patient_id])
+        
+        if shap_pending:
+            features = np.array(
+                [[0 if value is None else value for value in values]], dtype=np.float32
+            )
+            with _shap_in_flight_lock:
+                _shap_in_flight.add(prediction.id)
+            try:
+                _shap_pool.submit(
+                    _explain_prediction, prediction.id, pseudo_patient_id,
+                    computed_at, risk_score, features
+                )
+            except Exception:
+                with _shap_in_flight_lock:
+                    _shap_in_flight.discard(prediction.id)
+                raise
         
         logger.info("Prediction made",
                    patient_id=pseudo_patient_id,
@@ -257,31 +603,273 @@ class ModelService:
         
         return prediction
     
+    def _fetch_feature_matrix(
+        self,
+        pseudo_patient_ids: List[str]
+    ) -> Tuple[List[str], np.ndarray]:
+        """Load the latest features for many patients in one query.
+
+        Returns the ids that have features and an (N, F) float32 matrix with
+        columns in ``feature_columns`` order; missing values become 0. The
+        matrix is the thread's reusable input buffer when N fits in it.
+        """
+        columns = [getattr(PatientFeatures, col) for col in self.feature_columns]
+        # DISTINCT ON keeps only each patient's newest row, walking the
+        # (pseudo_patient_id, computed_at DESC) index once for the whole batch
+        stmt = select(PatientFeatures.pseudo_patient_id, *columns).where(
+            PatientFeatures.pseudo_patient_id.in_(pseudo_patient_ids)
+        ).order_by(
+            PatientFeatures.pseudo_patient_id, PatientFeatures.computed_at.desc()
+        ).distinct(PatientFeatures.pseudo_patient_id)
+        
+        # Columnar load: one array per feature instead of an ORM object per row
+        df = pd.read_sql(stmt, self.db.connection()).set_index("pseudo_patient_id")
+        
+        found_ids = [pid for pid in pseudo_patient_ids if pid in df.index]
+        if not found_ids:
+            return [], np.empty((0, len(self.feature_columns)), dtype=np.float32)
+        
+        # Fill the reusable row-major buffer one feature column at a time
+        rows = df.loc[found_ids]
+        X = _feature_buffer(len(found_ids))
+        for j, col in enumerate(self.feature_columns):
+            X[:, j] = rows[col].to_numpy(dtype=np.float32, na_value=0.0)
+        return found_ids, X
+    
+    def get_features_for_patients(
+        self,
+        pseudo_patient_ids: List[str]
+    ) -> Dict[str, np.ndarray]:
+        """Get the latest feature vector for each patient that has features."""
+        found_ids, X = self._fetch_feature_matrix(pseudo_patient_ids)
+        # Copy out of the reusable input buffer
+        return dict(zip(found_ids, X.copy()))
+    
+    def _predict_scores(self, X: np.ndarray) -> np.ndarray:
+        """Readmission probabilities for an (N, F) matrix in one model call."""
+        # No-op for the service's own buffers; converts anything else once here
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        session = get_onnx_session()
+        predictor = get_treelite_predictor() if X.shape[0] == 1 else None
+        with PREDICT_LATENCY.time():
+            if predictor is not None:
+                import treelite_runtime
+                return np.asarray(
+                    predictor.predict(treelite_runtime.DMatrix(X)), dtype=np.float64
+                ).reshape(-1)
+            if session is not None:
+                input_name = session.get_inputs()[0].name
+                # Classifier exports output [labels, probabilities]
+                probabilities = session.run(None, {input_name: X.astype(np.float32, copy=False)})[1]
+                return np.asarray(probabilities, dtype=np.float64)[:, 1]
+            return np.asarray(self.model.get_booster().inplace_predict(X), dtype=np.float64)
+    
+    def calculate_shap_values_batch(
+        self,
+        features: np.ndarray,
+        top_k: int = 10
+    ) -> Tuple[List[List[Dict]], np.ndarray]:
+        """Calculate SHAP values for a whole batch with one explainer call."""
+        features = np.ascontiguousarray(features, dtype=np.float32)
+        try:
+            explainer = get_shap_explainer()
+            shap_values = explainer.shap_values(features, check_additivity=False)
+            
+            # Handle different SHAP output formats
+            if isinstance(shap_values, list):
+                shap_values = shap_values[1]  # For binary classification
+            shap_values = np.asarray(shap_values).reshape(features.shape[0], -1)
+            
+            # Top-k by absolute impact per row: partition, then sort only k
+            abs_shap = np.abs(shap_values)
+            k = min(top_k, abs_shap.shape[1])
+            top_idx = np.argpartition(-abs_shap, k - 1, axis=1)[:, :k]
+            order = np.argsort(-np.take_along_axis(abs_shap, top_idx, axis=1), axis=1)
+            top_idx = np.take_along_axis(top_idx, order, axis=1)
+            
+            # Gather every column of the factor table at once, then zip rows
+            names = FEATURE_ARRAY[top_idx]
+            impacts = np.take_along_axis(abs_shap, top_idx, axis=1).tolist()
+            values = np.take_along_axis(features, top_idx, axis=1).astype(np.float64).tolist()
+            directions = np.where(
+                np.take_along_axis(shap_values, top_idx, axis=1) > 0,
+                "increases", "decreases"
+            ).tolist()
+            
+            all_factors = [
+                [
+                    {"feature": name, "impact": impact, "value": value, "direction": direction}
+                    for name, impact, value, direction in zip(*row)
+                ]
+                for row in zip(names, impacts, values, directions)
+            ]
+            
+            return all_factors, shap_values
+            
+        except Exception as e:
+            logger.error("Error calculating SHAP values", error=str(e))
+            return [[] for _ in range(features.shape[0])], np.empty((0, 0))
+    
+    def _materialize_prediction(
+        self,
+        patient_id: str,
+        risk_score: float,
+        risk_level: str,
+        ci_lower: float,
+        ci_upper: float,
+        top_factors: List[Dict],
+        shap_row: Optional[np.ndarray],
+        model_id,
+        timestamp: datetime
+    ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Build the insert parameters and response dict for one batch row."""
+        record = {
+            "pseudo_patient_id": patient_id,
+            "model_id": model_id,
+            "risk_score": risk_score,
+            "risk_level": risk_level,
+            "confidence_lower": ci_lower,
+            "confidence_upper": ci_upper,
+            "shap_values": dict(zip(self.feature_columns, shap_row.tolist()))
+            if shap_row is not None else {},
+            "top_risk_factors": top_factors,
+            "prediction_timestamp": timestamp,
+            "prediction_horizon_days": 30
+        }
+        prediction = {
+            "pseudo_patient_id": patient_id,
+            "encounter_id": None,
+            "risk_score": risk_score,
+            "risk_level": risk_level,
+            "confidence_interval": [ci_lower, ci_upper],
+            "top_risk_factors": top_factors,
+            "prediction_timestamp": timestamp,
+            "prediction_horizon_days": 30
+        }
+        return record, prediction
+    
+    def _score_batch_rows(
+        self,
+        found_ids: List[str],
+        X: np.ndarray,
+        errors: List[Dict[str, Any]]
+    ) -> Tuple[List[str], np.ndarray, np.ndarray]:
+        """Score a feature matrix, dropping rows that cannot be scored.
+
+        The matrix is scored in one call; if that fails, rows are scored one
+        at a time so a bad row only fails its own patient. Rows without a
+        finite score are reported in ``errors``. Returns the ids, features and
+        scores of the rows that remain.
+        """
+        try:
+            scores = self._predict_scores(X)
+        except Exception as e:
+            logger.warning("Batch scoring failed, scoring rows one by one", error=str(e))
+            scores = np.full(len(found_ids), np.nan)
+            for i, patient_id in enumerate(found_ids):
+                try:
+                    scores[i] = self._predict_scores(X[i:i + 1])[0]
+                except Exception as row_error:
+                    logger.error("Error predicting", patient_id=patient_id, error=str(row_error))
+        
+        valid = np.isfinite(scores)
+        if valid.all():
+            return found_ids, X, scores
+        
+        errors.extend(
+            {"pseudo_patient_id": patient_id, "error": "Could not score features"}
+            for patient_id, ok in zip(found_ids, valid.tolist()) if not ok
+        )
+        kept_ids = [patient_id for patient_id, ok in zip(found_ids, valid.tolist()) if ok]
+        return kept_ids, X[valid], scores[valid]
+    
     def batch_predict(
         self, 
         pseudo_patient_ids: List[str]
     ) -> Dict[str, Any]:
-        """Make predictions for multiple patients."""
+        """Make predictions for multiple patients.
+
+        Features, model scoring and SHAP are each done once for the whole
+        batch; predictions are persisted with one bulk INSERT and commit.
+        Returned predictions are plain dicts ready for the API response.
+
+        Missing features or a row that cannot be scored fail only that
+        patient. Failing to read the features or to store the predictions
+        fails every patient in the batch, since nothing was saved.
+        """
         predictions = []
         errors = []
         
-        for patient_id in pseudo_patient_ids:
-            try:
-                prediction = self.predict(patient_id)
-                if prediction:
-                    predictions.append(prediction)
+        try:
+            found_ids, X = self._fetch_feature_matrix(pseudo_patient_ids)
+        except Exception as e:
+            logger.error("Error loading batch features", error=str(e))
+            return self._batch_result(pseudo_patient_ids, [], [
+                {"pseudo_patient_id": pid, "error": str(e)}
+                for pid in pseudo_patient_ids
+            ])
+        
+        found = set(found_ids)
+        errors.extend(
+            {"pseudo_patient_id": pid, "error": "Features not found"}
+            for pid in pseudo_patient_ids if pid not in found
+        )
+        
+        if found_ids:
+            found_ids, X, scores = self._score_batch_rows(found_ids, X, errors)
+        
+        if found_ids:
+            levels, lower, upper = self._classify_batch(scores)
+            all_factors, shap_values = self.calculate_shap_values_batch(X)
+            
+            model_id = self._get_active_model_id()
+            timestamp = datetime.now()
+            
+            records = []
+            stored_ids = []
+            for i, (patient_id, score, level, ci_lower, ci_upper) in enumerate(zip(
+                found_ids, scores.tolist(), levels.tolist(), lower.tolist(), upper.tolist()
+            )):
+                try:
+                    record, prediction = self._materialize_prediction(
+                        patient_id, score, level, ci_lower, ci_upper, all_factors[i],
+                        shap_values[i] if len(shap_values) > 0 else None,
+                        model_id, timestamp
+                    )
+                except Exception as e:
+                    logger.error("Error predicting", patient_id=patient_id, error=str(e))
+                    errors.append({"pseudo_patient_id": patient_id, "error": str(e)})
+                    continue
+                records.append(record)
+                predictions.append(prediction)
+                stored_ids.append(patient_id)
+            
+            if records:
+                try:
+                    # One executemany INSERT instead of a unit-of-work flush per object
+                    self.db.execute(insert(RiskPrediction), records)
+                    self.db.commit()
+                except Exception as e:
+                    logger.error("Error storing batch predictions", error=str(e))
+                    self.db.rollback()
+                    errors.extend(
+                        {"pseudo_patient_id": pid, "error": str(e)}
+                        for pid in stored_ids
+                    )
+                    predictions = []
                 else:
-                    errors.append({
-                        "pseudo_patient_id": patient_id,
-                        "error": "Features not found"
-                    })
-            except Exception as e:
-                logger.error("Error predicting", patient_id=patient_id, error=str(e))
-                errors.append({
-                    "pseudo_patient_id": patient_id,
-                    "error": str(e)
-                })
+                    invalidate_predictions(stored_ids)
+                    logger.info("Batch prediction made", count=len(records))
         
+        return self._batch_result(pseudo_patient_ids, predictions, errors)
+    
+    @staticmethod
+    def _batch_result(
+        pseudo_patient_ids: List[str],
+        predictions: List[Dict[str, Any]],
+        errors: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Summary returned by batch_predict."""
         return {
             "total_processed": len(pseudo_patient_ids),
             "successful": len(predictions),
@@ -309,6 +897,7 @@ class ModelService:
         prediction.outcome_recorded_at = datetime.now()
         
         self.db.commit()
+        invalidate_predictions([pseudo_patient_id])
         
         logger.info("Outcome updated",
                    patient_id=pseudo_patient_id,
@@ -316,26 +905,58 @@ class ModelService:
         
         return True
     
-    def get_prediction(self, pseudo_patient_id: str) -> Optional[RiskPrediction]:
-        """Get latest prediction for a patient."""
-        return self.db.query(RiskPrediction).filter(
+    def get_prediction(self, pseudo_patient_id: str) -> Optional[PredictionSnapshot]:
+        """Get latest prediction for a patient, served from a short-lived cache.
+
+        Writes invalidate only this process's cache. With service_workers > 1,
+        another worker can keep serving the previous prediction for up to
+        PREDICTION_CACHE_TTL_SECONDS (30s) after a new prediction or outcome.
+        """
+        now = time.monotonic()
+        with _prediction_cache_lock:
+            entry = _prediction_cache.get(pseudo_patient_id)
+            if entry is not None and entry[0] > now:
+                return entry[1]
+        
+        row = self.db.query(RiskPrediction).filter(
             RiskPrediction.pseudo_patient_id == pseudo_patient_id
         ).order_by(RiskPrediction.prediction_timestamp.desc()).first()
+        
+        prediction = None
+        if row is not None:
+            prediction = PredictionSnapshot(
+                *(getattr(row, field) for field in PredictionSnapshot._fields)
+            )
+            with _prediction_cache_lock:
+                _prediction_cache[pseudo_patient_id] = (
+                    now + PREDICTION_CACHE_TTL_SECONDS, prediction
+                )
+                _prediction_cache.move_to_end(pseudo_patient_id)
+                if len(_prediction_cache) > PREDICTION_CACHE_MAX_SIZE:
+                    _prediction_cache.popitem(last=False)
+        
+        return prediction
     
-    def get_high_risk_patients(
-        self, 
-        threshold: float = None, 
-        limit: int = 100
-    ) -> List[RiskPrediction]:
-        """Get high-risk patients."""
+    def iter_high_risk_patients(
+        self,
+        threshold: float = None,
+        limit: int = 100,
+        chunk_size: int = 500
+    ) -> Iterator[Tuple[str, float, str, datetime]]:
+        """Stream high-risk rows as tuples from a server-side cursor."""
         threshold = threshold or settings.risk_threshold_high
         
-        return self.db.query(RiskPrediction).filter(
+        return self.db.query(
+            RiskPrediction.pseudo_patient_id,
+            RiskPrediction.risk_score,
+            RiskPrediction.risk_level,
+            RiskPrediction.prediction_timestamp
+        ).filter(
             RiskPrediction.risk_score >= threshold
         ).order_by(
             RiskPrediction.risk_score.desc(),
             RiskPrediction.prediction_timestamp.desc()
-        ).limit(limit).all()
+        ).limit(limit).yield_per(chunk_size)
     
     def get_model_info(self) -> Optional[MLModel]:
         """Get active model information."""
@@ -345,11 +966,13 @@ class ModelService:
     
     def get_model_metrics(self) -> Dict[str, Any]:
         """Calculate model performance metrics from recorded outcomes."""
-        predictions_with_outcome = self.db.query(RiskPrediction).filter(
+        rows = self.db.query(
+            RiskPrediction.risk_score, RiskPrediction.actual_readmission
+        ).filter(
             RiskPrediction.actual_readmission.isnot(None)
         ).all()
         
-        if not predictions_with_outcome:
+        if not rows:
             return {
                 "auc_roc": 0.82,  # Default from training
                 "precision": 0.78,
@@ -360,10 +983,13 @@ class ModelService:
                 "predictions_with_outcomes": 0
             }
         
-        # Calculate metrics
-        y_true = [int(p.actual_readmission) for p in predictions_with_outcome]
-        y_scores = [p.risk_score for p in predictions_with_outcome]
-        y_pred = [1 if s >= settings.risk_threshold_high else 0 for s in y_scores]
+        # Calculate metrics on (score, outcome) columns
+        arr = np.fromiter(
+            itertools.chain.from_iterable(rows), dtype=np.float64, count=2 * len(rows)
+        ).reshape(-1, 2)
+        y_scores = arr[:, 0]
+        y_true = arr[:, 1].astype(np.int8)
+        y_pred = (y_scores >= settings.risk_threshold_high).astype(np.int8)
         
         from sklearn.metrics import roc_auc_score, precision_score, recall_score, f1_score, brier_score_loss
         
@@ -384,33 +1010,26 @@ class ModelService:
             "f1_score": float(f1),
             "brier_score": float(brier),
             "total_predictions": self.db.query(func.count(RiskPrediction.id)).scalar(),
-            "predictions_with_outcomes": len(predictions_with_outcome)
+            "predictions_with_outcomes": len(rows)
         }
     
     def get_stats(self) -> Dict[str, Any]:
-        """Get prediction statistics."""
-        from datetime import date
-        
-        total = self.db.query(func.count(RiskPrediction.id)).scalar()
-        
-        high_risk = self.db.query(func.count(RiskPrediction.id)).filter(
-            RiskPrediction.risk_level == "HIGH"
-        ).scalar()
-        
-        medium_risk = self.db.query(func.count(RiskPrediction.id)).filter(
-            RiskPrediction.risk_level == "MEDIUM"
-        ).scalar()
-        
-        low_risk = self.db.query(func.count(RiskPrediction.id)).filter(
-            RiskPrediction.risk_level == "LOW"
-        ).scalar()
-        
-        avg_score = self.db.query(func.avg(RiskPrediction.risk_score)).scalar()
+        """Get prediction statistics in a single aggregate query."""
+        today = datetime.combine(date.today(), datetime.min.time())
+        count = func.count(RiskPrediction.id)
         
-        today = date.today()
-        today_count = self.db.query(func.count(RiskPrediction.id)).filter(
-            func.date(RiskPrediction.prediction_timestamp) == today
-        ).scalar()
+        total, high_risk, medium_risk, low_risk, avg_score, today_count = self.db.query(
+            count,
+            count.filter(RiskPrediction.risk_level == "HIGH"),
+            count.filter(RiskPrediction.risk_level == "MEDIUM"),
+            count.filter(RiskPrediction.risk_level == "LOW"),
+            func.avg(RiskPrediction.risk_score),
+            # Range on the raw column so the timestamp index stays usable
+            count.filter(
+                RiskPrediction.prediction_timestamp >= today,
+                RiskPrediction.prediction_timestamp < today + timedelta(days=1),
+            ),
+        ).one()
         
         return {
             "total_predictions": total or 0,
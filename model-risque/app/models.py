@@ -1,9 +1,10 @@
 """SQLAlchemy models for ModelRisque service."""
-from sqlalchemy import Column, String, Integer, Boolean, DateTime, Float, JSON
+from sqlalchemy import Column, String, Integer, Boolean, DateTime, Float, JSON, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 import uuid
 
+from app.config import settings
 from app.database import Base
 
 
@@ -59,6 +60,21 @@ class RiskPrediction(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
+    __table_args__ = (
+        # Latest prediction per patient (get_prediction, update_outcome)
+        Index("ix_rp_pid_ts", "pseudo_patient_id", prediction_timestamp.desc()),
+        # High-risk listing ordered by score then recency
+        Index("ix_rp_score_ts", risk_score.desc(), prediction_timestamp.desc()),
+        # Partial index over the high-risk tail only: the default 0.7 threshold
+        # (and any >= 0.5) is served from a far smaller index; lower
+        # thresholds fall back to ix_rp_score_ts
+        Index("ix_rp_high_risk", risk_score.desc(), postgresql_where=risk_score >= 0.5),
+        # Range scans on prediction time (predictions made today)
+        Index("idx_predictions_timestamp", prediction_timestamp),
+        # Rows with recorded outcomes, scanned by get_model_metrics
+        Index("ix_rp_outcome", "id", postgresql_where=actual_readmission.isnot(None)),
+    )
+
 
 class PatientFeatures(Base):
     """Patient features (read-only)."""
@@ -129,4 +145,14 @@ class PatientFeatures(Base):
     
     computed_at = Column(DateTime(timezone=True))
 
+    __table_args__ = (
+        # Latest feature row per patient; INCLUDE makes it covering, so
+        # feature reads are index-only scans with no heap fetch
+        Index(
+            "ix_pf_pid_computed_cov",
+            "pseudo_patient_id", computed_at.desc(),
+            postgresql_include=list(settings.feature_columns)
+        ),
+    )
+
 
@@ -4,9 +4,13 @@ Tests risk prediction and ML model functionality
 """
 import pytest
 import numpy as np
+import pandas as pd
 from unittest.mock import Mock, MagicMock, patch
 from datetime import datetime
-from app.model_service import ModelService, get_model
+from app.model_service import (
+    ModelService, PredictionSnapshot, _explain_prediction, _shap_in_flight,
+    explanation_pending, get_model
+)
 from app.models import RiskPrediction, PatientFeatures, MLModel
 
 
@@ -20,6 +24,12 @@ def model_service(mock_db):
     return ModelService(mock_db)
 
 
+def feature_row(features):
+    """Column tuple as returned by the feature query (values, then computed_at)."""
+    values = tuple(getattr(features, col) for col in ModelService.feature_columns)
+    return values + (features.computed_at,)
+
+
 @pytest.fixture
 def sample_features():
     features = PatientFeatures()
@@ -42,12 +52,12 @@ class TestModelService:
         """Test successful risk prediction"""
         # Arrange
         mock_db.query.return_value.filter.return_value.order_by.return_value.first.side_effect = [
-            sample_features,  # Patient features
+            feature_row(sample_features),  # Patient features
             None               # Active model
         ]
 
         with patch.object(model_service, 'model') as mock_model:
-            mock_model.predict_proba.return_value = np.array([[0.3, 0.7]])
+            mock_model.get_booster.return_value.inplace_predict.return_value = np.array([0.7])
 
             # Act
             result = model_service.predict("pseudol-123")
@@ -72,12 +82,12 @@ class TestModelService:
     def test_predict_high_risk(self, model_service, mock_db, sample_features):
         """Test high risk prediction"""
         mock_db.query.return_value.filter.return_value.order_by.return_value.first.side_effect = [
-            sample_features,
+            feature_row(sample_features),
             None
         ]
 
         with patch.object(model_service, 'model') as mock_model:
-            mock_model.predict_proba.return_value = np.array([[0.1, 0.9]])
+            mock_model.get_booster.return_value.inplace_predict.return_value = np.array([0.9])
 
             result = model_service.predict("pseudo-123")
 
@@ -87,23 +97,106 @@ class TestModelService:
     def test_predict_low_risk(self, model_service, mock_db, sample_features):
         """Test low risk prediction"""
         mock_db.query.return_value.filter.return_value.order_by.return_value.first.side_effect = [
-            sample_features,
+            feature_row(sample_features),
             None
         ]
 
         with patch.object(model_service, 'model') as mock_model:
-            mock_model.predict_proba.return_value = np.array([[0.9, 0.1]])
+            mock_model.get_booster.return_value.inplace_predict.return_value = np.array([0.1])
 
             result = model_service.predict("pseudo-123")
 
             assert result.risk_level == "LOW"
             assert result.risk_score <= 0.3
 
+    def test_predict_reuses_score_for_same_feature_version(self, model_service, mock_db, sample_features):
+        """Test unchanged features are not re-scored"""
+        sample_features.pseudo_patient_id = "pseudo-score-cache"
+        row = feature_row(sample_features)
+        mock_db.query.return_value.filter.return_value.order_by.return_value.first.return_value = row
+
+        with patch.object(model_service, 'model') as mock_model:
+            mock_model.get_booster.return_value.inplace_predict.return_value = np.array([0.5])
+
+            first = model_service.predict("pseudo-score-cache")
+            second = model_service.predict("pseudo-score-cache")
+
+            assert first.risk_score == second.risk_score
+            mock_model.get_booster.return_value.inplace_predict.assert_called_once()
+
+    def test_predict_defers_shap_when_async(self, model_service, mock_db, sample_features):
+        """Test SHAP is queued instead of computed inline with async_shap"""
+        sample_features.pseudo_patient_id = "pseudo-async"
+        mock_db.query.return_value.filter.return_value.order_by.return_value.first.return_value = feature_row(sample_features)
+
+        with patch.object(model_service, 'model') as mock_model, \
+             patch('app.model_service.settings.async_shap', True), \
+             patch('app.model_service._shap_pool') as mock_pool, \
+             patch.object(model_service, 'calculate_shap_values') as mock_shap:
+            mock_model.get_booster.return_value.inplace_predict.return_value = np.array([0.5])
+
+            result = model_service.predict("pseudo-async")
+
+            assert result.top_risk_factors == []
+            mock_shap.assert_not_called()
+            mock_pool.submit.assert_called_once()
+
+    def test_explain_prediction_recomputes_missing_shap(self, model_service, mock_db, sample_features):
+        """Test a prediction left without SHAP values is explained on read"""
+        mock_db.query.return_value.filter.return_value.order_by.return_value.first.return_value = feature_row(sample_features)
+        prediction = PredictionSnapshot(
+            "pred-1", "pseudo-123", None, 0.5, "MEDIUM", 0.4, 0.6, {}, [], datetime.now(), 30
+        )
+        factors = [{"feature": "age_at_admission", "impact": 0.2, "value": 65.0, "direction": "increases"}]
+        shap_row = np.zeros(len(ModelService.feature_columns))
+
+        with patch.object(model_service, 'calculate_shap_values', return_value=(factors, shap_row)):
+            explained = model_service.explain_prediction(prediction)
+
+        assert explained.top_risk_factors == factors
+        assert set(explained.shap_values) == set(ModelService.feature_columns)
+        mock_db.commit.assert_called_once()
+
+    def test_explain_prediction_unchanged_when_shap_fails(self, model_service, mock_db, sample_features):
+        """Test an empty SHAP result is not stored as an explanation"""
+        mock_db.query.return_value.filter.return_value.order_by.return_value.first.return_value = feature_row(sample_features)
+        prediction = PredictionSnapshot(
+            "pred-2", "pseudo-123", None, 0.5, "MEDIUM", 0.4, 0.6, {}, [], datetime.now(), 30
+        )
+
+        with patch.object(model_service, 'calculate_shap_values', return_value=([], np.array([]))):
+            assert model_service.explain_prediction(prediction) is prediction
+
+        mock_db.commit.assert_not_called()
+
+    def test_failed_background_shap_is_not_left_pending(self):
+        """Test a failing background SHAP job clears its in-flight marker"""
+        _shap_in_flight.add("pred-3")
+
+        with patch('app.database.SessionLocal', side_effect=RuntimeError("db down")):
+            _explain_prediction("pred-3", "pseudo-123", None, 0.5, np.zeros((1, len(ModelService.feature_columns)), dtype=np.float32))
+
+        assert not explanation_pending("pred-3")
+
+    def test_active_model_id_cached_until_invalidated(self, model_service, mock_db):
+        """Test the active model lookup is not repeated per prediction"""
+        lookup = mock_db.query.return_value.filter.return_value.limit.return_value.scalar
+        lookup.return_value = "model-1"
+        ModelService.invalidate_active_model_cache()
+
+        assert model_service._get_active_model_id() == "model-1"
+        assert model_service._get_active_model_id() == "model-1"
+        assert lookup.call_count == 1
+
+        ModelService.invalidate_active_model_cache()
+        model_service._get_active_model_id()
+        assert lookup.call_count == 2
+
     # ==================== Feature Preparation Tests ====================
 
     def test_get_features_for_patient(self, model_service, mock_db, sample_features):
         """Test feature retrieval for patient"""
-        mock_db.query.return_value.filter.return_value.order_by.return_value.first.return_value = sample_features
+        mock_db.query.return_value.filter.return_value.order_by.return_value.first.return_value = feature_row(sample_features)
 
         features_dict = model_service.get_features_for_patient("pseudo-123")
 
@@ -124,6 +217,14 @@ class TestModelService:
         assert isinstance(features_array, np.ndarray)
         assert features_array.shape[0] == 1
 
+    def test_prepare_features_column_order(self, model_service):
+        """Test features land in feature_columns order with missing values as 0"""
+        features_array = model_service.prepare_features({"gender_encoded": 1, "age_at_admission": 70})
+
+        assert features_array[0, 0] == 70
+        assert features_array[0, 1] == 1
+        assert features_array[0, 2:].sum() == 0
+
     # ==================== SHAP Explanations Tests ====================
 
     def test_calculate_shap_values(self, model_service):
@@ -159,6 +260,26 @@ class TestModelService:
 
     # ==================== Confidence Interval Tests ====================
 
+    def test_get_risk_levels_matches_scalar(self, model_service):
+        """Test vectorized risk levels agree with get_risk_level"""
+        scores = np.array([0.0, 0.39, 0.4, 0.69, 0.7, 1.0])
+
+        levels = model_service.get_risk_levels(scores)
+
+        assert levels.tolist() == [model_service.get_risk_level(s) for s in scores]
+
+    def test_classify_batch_matches_scalar(self, model_service):
+        """Test batch levels and intervals agree with the scalar helpers"""
+        scores = np.array([0.05, 0.45, 0.5, 0.8])
+
+        levels, lower, upper = model_service._classify_batch(scores)
+
+        for i, score in enumerate(scores.tolist()):
+            assert levels[i] == model_service.get_risk_level(score)
+            assert (lower[i], upper[i]) == pytest.approx(
+                model_service.calculate_confidence_interval(score)
+            )
+
     def test_calculate_confidence_interval(self, model_service):
         """Test confidence interval calculation"""
         lower, upper = model_service.calculate_confidence_interval(0.5)
@@ -171,20 +292,62 @@ class TestModelService:
 
     def test_batch_predict(self, model_service, mock_db, sample_features):
         """Test batch prediction"""
-        mock_db.query.return_value.filter.return_value.order_by.return_value.first.side_effect = [
-            sample_features,
-            None,
-            sample_features,
-            None
-        ]
+        frame = pd.DataFrame([{
+            "pseudo_patient_id": "pseudo-123",
+            **{col: getattr(sample_features, col) for col in model_service.feature_columns}
+        }])
+        mock_db.query.return_value.filter.return_value.first.return_value = None
 
-        with patch.object(model_service, 'model') as mock_model:
-            mock_model.predict_proba.return_value = np.array([[0.3, 0.7]])
+        with patch.object(model_service, 'model') as mock_model, \
+                patch('app.model_service.pd.read_sql', return_value=frame):
+            mock_model.get_booster.return_value.inplace_predict.return_value = np.array([0.7])
 
             result = model_service.batch_predict(["pseudo-123", "pseudo-456"])
 
             assert result["total_processed"] == 2
-            assert result["successful"] >= 0
+            assert result["successful"] == 1
+            assert result["errors"][0]["pseudo_patient_id"] == "pseudo-456"
+            assert result["predictions"][0]["risk_level"] == "HIGH"
+            mock_db.execute.assert_called_once()
+            mock_db.commit.assert_called_once()
+
+    def test_batch_predict_isolates_unscorable_rows(self, model_service, mock_db, sample_features):
+        """Test a row the model cannot score fails only that patient"""
+        frame = pd.DataFrame([
+            {"pseudo_patient_id": pid, **{col: getattr(sample_features, col) for col in model_service.feature_columns}}
+            for pid in ("pseudo-ok", "pseudo-bad")
+        ])
+        mock_db.query.return_value.filter.return_value.first.return_value = None
+
+        with patch.object(model_service, 'model') as mock_model, \
+                patch('app.model_service.pd.read_sql', return_value=frame):
+            mock_model.get_booster.return_value.inplace_predict.return_value = np.array([0.7, np.nan])
+
+            result = model_service.batch_predict(["pseudo-ok", "pseudo-bad"])
+
+            assert result["successful"] == 1
+            assert result["predictions"][0]["pseudo_patient_id"] == "pseudo-ok"
+            assert result["errors"] == [{"pseudo_patient_id": "pseudo-bad", "error": "Could not score features"}]
+            mock_db.commit.assert_called_once()
+
+    def test_batch_predict_insert_failure_fails_whole_batch(self, model_service, mock_db, sample_features):
+        """Test a failed bulk INSERT reports every scored patient as failed"""
+        frame = pd.DataFrame([{
+            "pseudo_patient_id": "pseudo-123",
+            **{col: getattr(sample_features, col) for col in model_service.feature_columns}
+        }])
+        mock_db.query.return_value.filter.return_value.first.return_value = None
+        mock_db.execute.side_effect = RuntimeError("insert failed")
+
+        with patch.object(model_service, 'model') as mock_model, \
+                patch('app.model_service.pd.read_sql', return_value=frame):
+            mock_model.get_booster.return_value.inplace_predict.return_value = np.array([0.7])
+
+            result = model_service.batch_predict(["pseudo-123", "pseudo-456"])
+
+            assert result["successful"] == 0
+            assert {e["pseudo_patient_id"] for e in result["errors"]} == {"pseudo-123", "pseudo-456"}
+            mock_db.rollback.assert_called_once()
 
     # ==================== Outcome Update Tests ====================
 
@@ -208,11 +371,30 @@ class TestModelService:
 
         assert success is False
 
+    def test_get_prediction_cached_until_outcome_update(self, model_service, mock_db):
+        """Test repeated reads hit the cache and outcome updates invalidate it"""
+        prediction = RiskPrediction()
+        prediction.pseudo_patient_id = "pseudo-cache"
+
+        query = mock_db.query.return_value.filter.return_value.order_by.return_value
+        query.first.return_value = prediction
+
+        first = model_service.get_prediction("pseudo-cache")
+        assert first.pseudo_patient_id == "pseudo-cache"
+        assert not isinstance(first, RiskPrediction)
+        assert model_service.get_prediction("pseudo-cache") is first
+        assert query.first.call_count == 1
+
+        model_service.update_outcome("pseudo-cache", True)
+        model_service.get_prediction("pseudo-cache")
+
+        assert query.first.call_count == 3
+
     # ==================== Statistics Tests ====================
 
     def test_get_stats(self, model_service, mock_db):
         """Test statistics retrieval"""
-        mock_db.query.return_value.scalar.return_value = 100
+        mock_db.query.return_value.one.return_value = (100, 20, 30, 50, 0.45, 7)
 
         stats = model_service.get_stats()
 
@@ -10,7 +10,10 @@ import java.time.LocalDateTime;
 import java.util.UUID;
 
 @Entity
-@Table(name = "fhir_patients")
+@Table(name = "fhir_patients", indexes = {
+        // Active patients newest first, used by the score-api patient listing
+        @Index(name = "idx_fhir_patients_active_created", columnList = "active, created_at DESC")
+})
 @Data
 @Builder
 @NoArgsConstructor
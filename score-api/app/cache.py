@@ -1,82 +1,165 @@
 """Redis cache utility for Score API."""
-import json
-import redis
-from typing import Optional, Any
+import asyncio
+import hashlib
+import time
+import orjson
+import redis.asyncio as redis
+from typing import Optional, Any, Dict, List
 from functools import wraps
+from prometheus_client import Counter
 import structlog
 
 logger = structlog.get_logger()
 
-# Redis connection (will be initialized on startup)
+# Hit/miss counts for the named response caches, exposed on /metrics
+CACHE_LOOKUPS = Counter(
+    "score_api_cache_lookups_total",
+    "Response cache lookups",
+    ["cache", "result"]
+)
+
+# Redis connection (set by the background connector once a ping succeeds)
 redis_client: Optional[redis.Redis] = None
 
-def init_redis(host: str = "redis", port: int = 6379, db: int = 0):
-    """Initialize Redis connection."""
+# Circuit breaker: after CIRCUIT_FAILURE_THRESHOLD consecutive errors, skip
+# Redis for CIRCUIT_RESET_SECONDS instead of paying a timeout per request
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_RESET_SECONDS = 30.0
+_consecutive_failures = 0
+_circuit_open_until = 0.0
+
+async def init_redis(host: str = "redis", port: int = 6379, db: int = 0) -> bool:
+    """Try once to connect to Redis; returns True when connected."""
     global redis_client
+    client = redis.Redis(
+        host=host,
+        port=port,
+        db=db,
+        decode_responses=True,
+        socket_connect_timeout=5,
+        socket_timeout=2
+    )
     try:
-        redis_client = redis.Redis(
-            host=host,
-            port=port,
-            db=db,
-            decode_responses=True,
-            socket_connect_timeout=5
-        )
-        # Test connection
-        redis_client.ping()
-        logger.info("Redis connected successfully", host=host, port=port)
+        # Test connection before publishing the client
+        await client.ping()
     except Exception as e:
         logger.warning("Redis connection failed, cache disabled", error=str(e))
-        redis_client = None
+        return False
+    redis_client = client
+    logger.info("Redis connected successfully", host=host, port=port)
+    return True
+
+async def connect_redis_with_backoff(
+    host: str = "redis",
+    port: int = 6379,
+    db: int = 0,
+    max_delay: float = 60.0
+):
+    """Keep trying to connect with exponential backoff (run as a background task)."""
+    delay = 0.5
+    while not await init_redis(host, port, db):
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, max_delay)
+
+def start_redis(host: str = "redis", port: int = 6379, db: int = 0) -> asyncio.Task:
+    """Connect to Redis in the background so startup doesn't wait on it."""
+    return asyncio.create_task(connect_redis_with_backoff(host, port, db))
+
+def _cache_available() -> bool:
+    """Whether a client exists and the circuit breaker is closed."""
+    return redis_client is not None and time.monotonic() >= _circuit_open_until
+
+def _record_success():
+    """Reset the consecutive failure count."""
+    global _consecutive_failures
+    _consecutive_failures = 0
 
-def get_cache(key: str) -> Optional[Any]:
+def _record_failure():
+    """Count a failed call, opening the circuit at the threshold."""
+    global _consecutive_failures, _circuit_open_until
+    _consecutive_failures += 1
+    if _consecutive_failures >= CIRCUIT_FAILURE_THRESHOLD:
+        _circuit_open_until = time.monotonic() + CIRCUIT_RESET_SECONDS
+        _consecutive_failures = 0
+        logger.warning("Redis circuit opened", seconds=CIRCUIT_RESET_SECONDS)
+
+async def get_cache(key: str) -> Optional[Any]:
     """Get value from cache."""
-    if not redis_client:
+    if not _cache_available():
         return None
     try:
-        value = redis_client.get(key)
+        value = await redis_client.get(key)
+        _record_success()
         if value:
-            return json.loads(value)
+            return orjson.loads(value)
         return None
     except Exception as e:
+        _record_failure()
         logger.warning("Cache get error", key=key, error=str(e))
         return None
 
-def set_cache(key: str, value: Any, expire: int = 3600):
+async def set_cache(key: str, value: Any, expire: int = 3600):
     """Set value in cache with expiration (default 1 hour)."""
-    if not redis_client:
+    if not _cache_available():
         return False
     try:
-        redis_client.setex(
+        await redis_client.setex(
             key,
             expire,
-            json.dumps(value, default=str)
+            orjson.dumps(value, default=str, option=orjson.OPT_SERIALIZE_NUMPY)
         )
+        _record_success()
         return True
     except Exception as e:
+        _record_failure()
         logger.warning("Cache set error", key=key, error=str(e))
         return False
 
-def delete_cache(key: str):
+async def delete_cache(key: str):
     """Delete key from cache."""
-    if not redis_client:
+    if not _cache_available():
         return False
     try:
-        redis_client.delete(key)
+        await redis_client.delete(key)
+        _record_success()
         return True
     except Exception as e:
+        _record_failure()
         logger.warning("Cache delete error", key=key, error=str(e))
         return False
 
+async def delete_cache_many(keys: List[str]):
+    """Delete several keys with one DEL."""
+    if not _cache_available() or not keys:
+        return False
+    try:
+        await redis_client.delete(*keys)
+        _record_success()
+        return True
+    except Exception as e:
+        _record_failure()
+        logger.warning("Cache delete error", count=len(keys), error=str(e))
+        return False
+
+def make_key_digest(args: tuple, kwargs: Dict[str, Any]) -> str:
+    """Short, stable digest of call arguments for use in cache keys."""
+    payload = orjson.dumps(
+        (args, kwargs),
+        default=str,
+        option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+    )
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
 def cache_result(key_prefix: str, expire: int = 3600):
     """Decorator to cache function results."""
     def decorator(func):
         @wraps(func)
         async def wrapper(*args, **kwargs):
-            # Generate cache key from function name and arguments
-            cache_key = f"{key_prefix}:{func.__name__}:{str(args)}:{str(kwargs)}"
+            # Generate cache key from function name and a digest of the arguments
+            cache_key = f"{key_prefix}:{func.__name__}:{make_key_digest(args, kwargs)}"
             
             # Try to get from cache
-            cached = get_cache(cache_key)
+            cached = await get_cache(cache_key)
             if cached is not None:
                 logger.debug("Cache hit", key=cache_key)
                 return cached
@@ -84,7 +167,7 @@ def cache_result(key_prefix: str, expire: int = 3600):
             # Execute function and cache result
             logger.debug("Cache miss", key=cache_key)
             result = await func(*args, **kwargs)
-            set_cache(cache_key, result, expire)
+            await set_cache(cache_key, result, expire)
             return result
         return wrapper
     return decorator
@@ -1,8 +1,9 @@
 """Configuration settings for ScoreAPI service."""
 from pydantic_settings import BaseSettings
-from functools import lru_cache
-from typing import List, Union
+from functools import cached_property
+from typing import Tuple, Union
 import os
+import structlog
 
 
 class Settings(BaseSettings):
@@ -17,6 +18,7 @@ class Settings(BaseSettings):
     service_name: str = "score-api"
     service_host: str = "0.0.0.0"
     service_port: int = 8085
+    service_workers: int = 1
     debug: bool = False
     
     # JWT Configuration
@@ -30,6 +32,21 @@ class Settings(BaseSettings):
     featurizer_service_url: str = "http://localhost:8083"
     deid_service_url: str = "http://localhost:8082"
     proxy_fhir_url: str = "http://proxy-fhir:8081"  # Internal Docker network URL
+    # Retries for failed connections to internal services (e.g. during restarts)
+    http_connect_retries: int = 2
+    
+    # Redis cache TTLs (seconds)
+    dashboard_cache_ttl: int = 120
+    risk_score_cache_ttl: int = 60
+    high_risk_cache_ttl: int = 30
+    
+    # Seconds between REFRESH MATERIALIZED VIEW runs for the dashboard stats,
+    # and the minimum gap when new predictions request an early refresh
+    dashboard_refresh_seconds: int = 60
+    dashboard_min_refresh_seconds: int = 10
+    
+    # Patients per request to the model service's batch prediction endpoint
+    prediction_batch_size: int = 256
     
     # Rate limiting
     rate_limit_per_minute: int = 60
@@ -46,25 +63,27 @@ class Settings(BaseSettings):
         case_sensitive = False
         # Allow environment variables to override defaults
         env_prefix = ""  # No prefix needed, use exact variable names
+        # Settings are read once at startup and never mutated
+        frozen = True
     
-    @property
-    def cors_origins_list(self) -> List[str]:
-        """Parse CORS origins from comma-separated string."""
+    @cached_property
+    def cors_origins_list(self) -> Tuple[str, ...]:
+        """Parse CORS origins from comma-separated string (once per instance)."""
         if isinstance(self.cors_origins, str):
             # Handle "*" for development (allow all origins)
             if self.cors_origins.strip() == "*":
-                return ["*"]
-            return [origin.strip() for origin in self.cors_origins.split(",") if origin.strip()]
-        return self.cors_origins if isinstance(self.cors_origins, list) else []
+                return ("*",)
+            return tuple(origin.strip() for origin in self.cors_origins.split(",") if origin.strip())
+        return tuple(self.cors_origins) if isinstance(self.cors_origins, list) else ()
+
+# Module-level singleton, parsed from the environment once at import
+settings = Settings()
+
+# Database URL preview (first 50 chars to hide password), debug level only
+_db_url_preview = settings.database_url[:50] + "..." if len(settings.database_url) > 50 else settings.database_url
+structlog.get_logger().debug("Settings loaded", database_url=_db_url_preview)
 
 
-@lru_cache()
 def get_settings() -> Settings:
-    """Get cached settings instance."""
-    # Force reload from environment variables
-    settings = Settings()
-    # Debug: print database URL (first 50 chars to hide password)
-    db_url_preview = settings.database_url[:50] + "..." if len(settings.database_url) > 50 else settings.database_url
-    print(f"[Config] Database URL: {db_url_preview}")
+    """Get the settings instance (kept for existing call sites)."""
     return settings
-
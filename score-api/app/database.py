@@ -10,10 +10,13 @@ settings = get_settings()
 engine = create_engine(
     settings.database_url,
     poolclass=QueuePool,
-    pool_size=10,
-    max_overflow=20,
+    # Sized to cover the 40-thread endpoint threadpool plus headroom
+    pool_size=25,
+    max_overflow=25,
     pool_timeout=30,
     pool_recycle=1800,
+    pool_pre_ping=True,
+    query_cache_size=1200,
 )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
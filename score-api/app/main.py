@@ -1,16 +1,21 @@
 """Main FastAPI application for ScoreAPI service."""
+import asyncio
 import time
 from datetime import datetime, timedelta
 from typing import List, Optional, Dict, Any
-from fastapi import FastAPI, Depends, HTTPException, status, Request
+from uuid import UUID
+from fastapi import FastAPI, Depends, HTTPException, status, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
+from starlette.concurrency import run_in_threadpool
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 import structlog
 import httpx
 
 from app.config import get_settings
-from app.database import get_db
+from app.database import get_db, SessionLocal
 from app.models import User
 from app.schemas import (
     LoginRequest, TokenResponse, RefreshTokenRequest,
@@ -18,41 +23,98 @@ from app.schemas import (
     RiskScoreResponse, RiskFactor, HighRiskPatientsResponse,
     PatientRiskSummary, RiskExplanationResponse,
     DashboardStats, AuditLogEntry, HealthResponse,
-    PatientCreateRequest, PatientCreateResponse
+    PatientCreateRequest, PatientCreateResponse, BatchPredictionRequest
 )
 from app.auth import (
     authenticate_user, create_access_token, create_refresh_token,
-    decode_token, get_current_user, get_admin_user
+    decode_token, get_current_user, get_admin_user, get_password_hash
+)
+from app.services import (
+    UserService, AuditService, RiskScoreService, PatientService, risk_score_cache_key
 )
-from app.services import UserService, AuditService, RiskScoreService, PatientService
 from app.models import DeidPatient, RiskPrediction
-from app.cache import init_redis, get_cache, set_cache, delete_cache, redis_client
+from app.cache import (
+    start_redis, get_cache, set_cache, delete_cache, delete_cache_many, CACHE_LOOKUPS
+)
+from prometheus_client import Counter
 from prometheus_fastapi_instrumentator import Instrumentator
 
 settings = get_settings()
 logger = structlog.get_logger()
 
+_PING_SQL = text("SELECT 1")
+
+# Response header carrying the keyset cursor for the next page of a listing
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+NEXT_CURSOR_ID_HEADER = "X-Next-Cursor-Id"
+
+# Encoders for the list responses. Those endpoints are sync and already run in
+# the threadpool, so encoding the body there keeps it off the event loop.
+_PATIENT_LIST_JSON = TypeAdapter(List[PatientRiskSummary])
+_AUDIT_LOG_JSON = TypeAdapter(List[AuditLogEntry])
+
+
+def _json_response(content: bytes, headers: Optional[Dict[str, str]] = None) -> Response:
+    """Wrap an already-encoded JSON body."""
+    return Response(content=content, media_type="application/json", headers=headers)
+
+# Redis key for the global dashboard aggregates ({domain}:{identifier})
+DASHBOARD_CACHE_KEY = "analytics:dashboard:global"
+
+
+def high_risk_cache_key(threshold: float, limit: int, service: Optional[str]) -> str:
+    """Redis key for one high-risk listing; expiry alone keeps it fresh."""
+    return f"analytics:highrisk:{threshold}:{limit}:{service or 'all'}"
+
+# Process-local copy of the dashboard stats in front of Redis, so bursts of
+# polling from several tabs are served without any I/O
+DASHBOARD_LOCAL_TTL_SECONDS = 30.0
+_dashboard_local: Optional[Dict[str, Any]] = None
+_dashboard_local_ts = 0.0
+
+
+def invalidate_dashboard_local():
+    """Drop the process-local dashboard stats."""
+    global _dashboard_local
+    _dashboard_local = None
+
+# Set by prediction writes so the refresh loop runs now instead of at the next
+# interval; cached copies are dropped only once the view is current, so reads
+# in between cannot re-cache the old row
+_dashboard_stale = asyncio.Event()
+
+
+def invalidate_dashboard_stats():
+    """Refresh the dashboard view ahead of schedule, then drop cached stats."""
+    _dashboard_stale.set()
+
 # Create FastAPI app
 app = FastAPI(
     title="ScoreAPI",
     description="Main REST API for HealthFlow-MS - Secure access to risk scores and patient data",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    # Encode response bodies with orjson (C encoder, native datetime/UUID)
+    default_response_class=ORJSONResponse
 )
 
 # CORS configuration - get allowed origins
 cors_origins = settings.cors_origins_list
-print(f"[CORS] Configured origins: {cors_origins}")  # Debug print
 logger.info("CORS origins configured", origins=cors_origins)
 
-# Initialize Prometheus metrics BEFORE middlewares
-Instrumentator().instrument(app).expose(app)
+# Initialize Prometheus metrics BEFORE middlewares; handler labels are route
+# templates, unmatched paths and scrape/probe endpoints are not recorded
+Instrumentator(
+    should_group_status_codes=True,
+    should_ignore_untemplated=True,
+    excluded_handlers=["/metrics", "/health"]
+).instrument(app).expose(app)
 
 # CORS middleware - must be added before routes
 # Note: allow_origins=["*"] doesn't work with allow_credentials=True
 # So we use the explicit list or handle "*" specially
-if cors_origins == ["*"]:
+if cors_origins == ("*",):
     # For development: allow all origins (but credentials won't work)
     app.add_middleware(
         CORSMiddleware,
@@ -67,7 +129,7 @@ else:
     # Production: specific origins with credentials
     app.add_middleware(
         CORSMiddleware,
-        allow_origins=cors_origins if cors_origins else ["http://localhost:8087"],
+        allow_origins=list(cors_origins) if cors_origins else ["http://localhost:8087"],
         allow_credentials=True,
         allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS", "PATCH"],
         allow_headers=["*"],
@@ -76,32 +138,196 @@ else:
     )
 
 
+# Audit records are written by a background task, not on the response path;
+# when the queue is full (writer stalled), records are dropped
+AUDIT_QUEUE_MAX_SIZE = 10000
+_audit_queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue(maxsize=AUDIT_QUEUE_MAX_SIZE)
+
+# Records are inserted in batches of up to AUDIT_BATCH_SIZE, flushed at least
+# every AUDIT_FLUSH_SECONDS. Every request is logged, but only API calls made
+# by an identified user are stored.
+AUDIT_BATCH_SIZE = 500
+AUDIT_FLUSH_SECONDS = 1.0
+AUDIT_PATH_PREFIX = "/api/v1/"
+AUDIT_SHUTDOWN_TIMEOUT_SECONDS = 5.0
+
+# Session factory for background work (audit writes, dashboard refreshes);
+# tests point it at their own database
+app.state.background_session_factory = SessionLocal
+
+AUDIT_DROPPED = Counter(
+    "score_api_audit_records_dropped_total",
+    "Audit records dropped because the queue was full"
+)
+
+
+def _write_audit_batch(batch: List[Dict[str, Any]]):
+    """Insert a batch of audit records with a dedicated session."""
+    db = app.state.background_session_factory()
+    try:
+        AuditService(db).log_requests(batch)
+    finally:
+        db.close()
+
+
+async def _drain_audit_queue():
+    """Log queued audit records and persist them to api_audit_log in batches."""
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = [await _audit_queue.get()]
+        deadline = loop.time() + AUDIT_FLUSH_SECONDS
+        while len(batch) < AUDIT_BATCH_SIZE:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(_audit_queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        
+        try:
+            for record in batch:
+                logger.info(
+                    "api_request",
+                    method=record["method"],
+                    path=record["endpoint"],
+                    status_code=record["response_status"],
+                    process_time_ms=record["response_time_ms"]
+                )
+            rows = [r for r in batch if r["user_id"] is not None]
+            if rows:
+                await run_in_threadpool(_write_audit_batch, rows)
+        except Exception as e:
+            logger.warning("Audit log flush failed", count=len(batch), error=str(e))
+        finally:
+            for _ in batch:
+                _audit_queue.task_done()
+
+
 # Audit logging middleware
 @app.middleware("http")
 async def audit_middleware(request: Request, call_next):
     """Log all API requests for audit trail."""
-    start_time = time.time()
+    start_time = time.perf_counter_ns()
     response = await call_next(request)
-    process_time = int((time.time() - start_time) * 1000)
-    
-    # Log to structured logger
-    logger.info(
-        "api_request",
-        method=request.method,
-        path=request.url.path,
-        status_code=response.status_code,
-        process_time_ms=process_time
-    )
+    process_time = (time.perf_counter_ns() - start_time) // 1_000_000
+    
+    # Hand off to the audit worker. The user is set on request.state by
+    # get_current_user (or login); only API routes are attributed.
+    path = request.url.path
+    user_id = None
+    patient_ids = None
+    if path.startswith(AUDIT_PATH_PREFIX) and request.method != "OPTIONS":
+        user_id = getattr(request.state, "user_id", None)
+        patient_id = request.scope.get("path_params", {}).get("patient_id")
+        if patient_id is not None:
+            patient_ids = [patient_id]
+    try:
+        _audit_queue.put_nowait({
+            "user_id": user_id,
+            "endpoint": path,
+            "method": request.method,
+            "response_status": response.status_code,
+            "response_time_ms": process_time,
+            "patient_ids_accessed": patient_ids,
+            "ip_address": request.client.host if request.client else None,
+            "user_agent": request.headers.get("user-agent")
+        })
+    except asyncio.QueueFull:
+        AUDIT_DROPPED.inc()
     
     return response
 
 
+def _refresh_dashboard_view(min_age_seconds: float) -> bool:
+    """Refresh the dashboard stats view with a dedicated session."""
+    db = app.state.background_session_factory()
+    try:
+        return RiskScoreService(db).refresh_dashboard_view(min_age_seconds)
+    finally:
+        db.close()
+
+
+async def _refresh_dashboard_view_loop():
+    """
+    Refresh the dashboard stats view every dashboard_refresh_seconds, or
+    early once new predictions mark it stale, but no more often than every
+    dashboard_min_refresh_seconds. The view's refreshed_at and an advisory
+    lock keep several workers from repeating a refresh another one has done.
+    """
+    loop = asyncio.get_running_loop()
+    min_age = float(settings.dashboard_min_refresh_seconds)
+    while True:
+        try:
+            await run_in_threadpool(_refresh_dashboard_view, min_age)
+        except Exception as e:
+            logger.warning("Dashboard view refresh failed", error=str(e))
+        # Cached stats may predate the view's latest refresh (or, without the
+        # view, the live figures the next read will compute)
+        await delete_cache(DASHBOARD_CACHE_KEY)
+        invalidate_dashboard_local()
+        
+        last_attempt = loop.time()
+        try:
+            await asyncio.wait_for(
+                _dashboard_stale.wait(), settings.dashboard_refresh_seconds
+            )
+        except asyncio.TimeoutError:
+            min_age = float(settings.dashboard_refresh_seconds)
+            continue
+        # Debounce: predictions arriving meanwhile set the flag again and are
+        # covered by the refresh below, so a burst collapses into one refresh
+        stale_at = loop.time()
+        _dashboard_stale.clear()
+        await asyncio.sleep(max(
+            0.0, last_attempt + settings.dashboard_min_refresh_seconds - loop.time()
+        ))
+        # Skip only if some worker has refreshed since the view went stale
+        min_age = loop.time() - stale_at
+
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize on startup."""
     logger.info("Starting ScoreAPI service", port=settings.service_port)
-    # Initialize Redis cache
-    init_redis(host="redis", port=6379)
+    # Connect to Redis in the background; the cache stays disabled until then
+    app.state.redis_task = start_redis(host="redis", port=6379)
+    # Start the audit log worker
+    app.state.audit_task = asyncio.create_task(_drain_audit_queue())
+    # Keep the dashboard stats materialized view fresh
+    app.state.dashboard_task = asyncio.create_task(_refresh_dashboard_view_loop())
+    # Pooled client for calls to internal services, reused across requests.
+    # Transport retries only cover failed connection attempts, so they are
+    # safe for the prediction POSTs.
+    app.state.http = httpx.AsyncClient(
+        timeout=30.0,
+        transport=httpx.AsyncHTTPTransport(
+            retries=settings.http_connect_retries,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=50)
+        )
+    )
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background workers and close shared clients."""
+    # Let the audit worker flush what is already queued before stopping it
+    try:
+        await asyncio.wait_for(_audit_queue.join(), AUDIT_SHUTDOWN_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        logger.warning("Audit queue not drained at shutdown", pending=_audit_queue.qsize())
+    for task_name in ("audit_task", "redis_task", "dashboard_task"):
+        task = getattr(app.state, task_name, None)
+        if task is not None:
+            task.cancel()
+    http_client = getattr(app.state, "http", None)
+    if http_client is not None:
+        await http_client.aclose()
+
+
+def get_http_client(request: Request) -> httpx.AsyncClient:
+    """Dependency returning the app's shared HTTP client."""
+    return request.app.state.http
 
 
 # Root endpoint
@@ -148,10 +374,10 @@ async def root():
 
 # Health endpoint
 @app.get("/health", response_model=HealthResponse, tags=["Health"])
-async def health_check(db: Session = Depends(get_db)):
+def health_check(db: Session = Depends(get_db)):
     """Health check endpoint."""
     try:
-        db.execute(text("SELECT 1"))
+        db.execute(_PING_SQL)
         db_status = "connected"
     except Exception:
         db_status = "disconnected"
@@ -176,7 +402,6 @@ async def test_cache():
     Test Redis cache functionality.
     Tests set, get, and delete operations.
     """
-    import time
     from app.cache import get_cache, set_cache, delete_cache, redis_client
     
     test_key = "test:cache:healthflow"
@@ -200,15 +425,15 @@ async def test_cache():
     
     try:
         # Test 1: Set cache
-        set_result = set_cache(test_key, test_value, expire=60)
+        set_result = await set_cache(test_key, test_value, expire=60)
         results["tests"]["set"] = {
             "success": set_result,
             "key": test_key
         }
         
         # Test 2: Get cache
-        time.sleep(0.1)  # Small delay
-        cached_value = get_cache(test_key)
+        await asyncio.sleep(0.1)  # Small delay
+        cached_value = await get_cache(test_key)
         results["tests"]["get"] = {
             "success": cached_value is not None,
             "value": cached_value,
@@ -216,25 +441,27 @@ async def test_cache():
         }
         
         # Test 3: Delete cache
-        delete_result = delete_cache(test_key)
+        delete_result = await delete_cache(test_key)
         results["tests"]["delete"] = {
             "success": delete_result
         }
         
         # Test 4: Verify deletion
-        after_delete = get_cache(test_key)
+        after_delete = await get_cache(test_key)
         results["tests"]["verify_delete"] = {
             "success": after_delete is None
         }
         
         # Get Redis info
         try:
-            info = redis_client.info()
+            info, total_keys = await asyncio.gather(
+                redis_client.info(), redis_client.dbsize()
+            )
             results["redis_info"] = {
                 "version": info.get("redis_version"),
                 "used_memory_human": info.get("used_memory_human"),
                 "connected_clients": info.get("connected_clients"),
-                "total_keys": redis_client.dbsize()
+                "total_keys": total_keys
             }
         except Exception as e:
             results["redis_info"] = {"error": str(e)}
@@ -263,7 +490,7 @@ async def test_cache():
 # ============================================
 
 @app.post("/api/v1/auth/login", response_model=TokenResponse, tags=["Authentication"])
-async def login(request: LoginRequest, db: Session = Depends(get_db)):
+def login(request: LoginRequest, http_request: Request, db: Session = Depends(get_db)):
     """
     Authenticate user and return JWT tokens.
     """
@@ -275,25 +502,30 @@ async def login(request: LoginRequest, db: Session = Depends(get_db)):
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    http_request.state.user_id = user.id
+    
+    # Snapshot the profile before the commit expires the instance, so the
+    # response needs no reload
+    user_response = UserResponse.model_validate(user)
     
     # Update last login
     user_service = UserService(db)
-    user_service.update_last_login(user)
+    user_response.last_login = user_service.update_last_login(user)
     
     # Create tokens
-    access_token = create_access_token(data={"sub": user.username})
-    refresh_token = create_refresh_token(data={"sub": user.username})
+    access_token = create_access_token(data={"sub": user_response.username})
+    refresh_token = create_refresh_token(data={"sub": user_response.username})
     
     return TokenResponse(
         access_token=access_token,
         refresh_token=refresh_token,
         expires_in=settings.jwt_expiration_hours * 3600,
-        user=UserResponse.model_validate(user)
+        user=user_response
     )
 
 
 @app.post("/api/v1/auth/refresh", response_model=TokenResponse, tags=["Authentication"])
-async def refresh_token(request: RefreshTokenRequest, db: Session = Depends(get_db)):
+def refresh_token(request: RefreshTokenRequest, db: Session = Depends(get_db)):
     """
     Refresh access token using refresh token.
     """
@@ -347,7 +579,7 @@ async def get_patient_risk_score(
     Get risk score for a specific patient.
     """
     risk_service = RiskScoreService(db)
-    prediction = risk_service.get_patient_risk_score(patient_id)
+    prediction = await risk_service.get_patient_risk_score_cached(patient_id)
     
     if not prediction:
         raise HTTPException(
@@ -356,15 +588,15 @@ async def get_patient_risk_score(
         )
     
     return RiskScoreResponse(
-        patient_id=prediction.pseudo_patient_id,
-        risk_score=prediction.risk_score,
-        risk_level=prediction.risk_level,
-        prediction_date=prediction.prediction_timestamp,
-        discharge_date=prediction.discharge_date,
+        patient_id=prediction["pseudo_patient_id"],
+        risk_score=prediction["risk_score"],
+        risk_level=prediction["risk_level"],
+        prediction_date=prediction["prediction_timestamp"],
+        discharge_date=prediction["discharge_date"],
         top_risk_factors=[
-            RiskFactor(**factor) for factor in prediction.top_risk_factors
-        ] if prediction.top_risk_factors else [],
-        confidence_interval=[prediction.confidence_lower, prediction.confidence_upper],
+            RiskFactor.model_construct(**factor) for factor in prediction["top_risk_factors"]
+        ] if prediction["top_risk_factors"] else [],
+        confidence_interval=[prediction["confidence_lower"], prediction["confidence_upper"]],
         model_version="v2.1.0"
     )
 
@@ -379,7 +611,7 @@ async def get_risk_explanation(
     Get detailed SHAP explanation for a patient's risk score.
     """
     risk_service = RiskScoreService(db)
-    prediction = risk_service.get_patient_risk_score(patient_id)
+    prediction = await risk_service.get_patient_risk_score_cached(patient_id)
     
     if not prediction:
         raise HTTPException(
@@ -388,120 +620,69 @@ async def get_risk_explanation(
         )
     
     # Generate interpretation text
-    interpretation = f"This patient has a {prediction.risk_level} risk of readmission within 30 days "
-    interpretation += f"with a score of {prediction.risk_score:.2f}. "
+    interpretation = f"This patient has a {prediction['risk_level']} risk of readmission within 30 days "
+    interpretation += f"with a score of {prediction['risk_score']:.2f}. "
     
-    if prediction.top_risk_factors:
-        top_factor = prediction.top_risk_factors[0]
+    if prediction["top_risk_factors"]:
+        top_factor = prediction["top_risk_factors"][0]
         interpretation += f"The main contributing factor is {top_factor['feature']} "
         interpretation += f"which {top_factor['direction']} the risk."
     
     return RiskExplanationResponse(
-        patient_id=prediction.pseudo_patient_id,
-        risk_score=prediction.risk_score,
-        risk_level=prediction.risk_level,
-        shap_values=prediction.shap_values or {},
+        patient_id=prediction["pseudo_patient_id"],
+        risk_score=prediction["risk_score"],
+        risk_level=prediction["risk_level"],
+        shap_values=prediction["shap_values"] or {},
         top_risk_factors=[
-            RiskFactor(**factor) for factor in prediction.top_risk_factors
-        ] if prediction.top_risk_factors else [],
-        prediction_date=prediction.prediction_timestamp,
+            RiskFactor.model_construct(**factor) for factor in prediction["top_risk_factors"]
+        ] if prediction["top_risk_factors"] else [],
+        prediction_date=prediction["prediction_timestamp"],
         interpretation=interpretation
     )
 
 
 @app.get("/api/v1/patients", response_model=List[PatientRiskSummary], tags=["Patients"])
-async def list_all_patients(
+def list_all_patients(
     limit: int = 100,
+    after: Optional[datetime] = None,
+    after_id: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     List all patients (both FHIR and anonymized) with their risk information if available.
-    """
-    result = []
     
-    # Get anonymized patients (deid_patients)
+    Newest first. When a full page is returned, the X-Next-Cursor and
+    X-Next-Cursor-Id headers hold the values to pass as `after` and
+    `after_id`; X-Next-Cursor is omitted once the page ends on a patient
+    without a creation time.
+    """
+    # Anonymized patients with their latest risk and FHIR patients not yet
+    # anonymized (overlap is excluded in SQL)
     patient_service = PatientService(db)
-    deid_patients = patient_service.search_patients(limit=limit)
-    
-    for patient in deid_patients:
-        summary = patient_service.get_patient_summary(patient.pseudo_id)
-        if summary:
-            result.append(PatientRiskSummary(**summary))
-        else:
-            result.append(PatientRiskSummary(
-                patient_id=patient.pseudo_id,
-                age_group=patient.age_group,
-                gender=patient.gender,
-                risk_score=None,
-                risk_level=None,
-                last_prediction_date=None
-            ))
-    
-    # Get unique FHIR IDs from deid_patients
-    existing_fhir_ids = {p.original_fhir_id for p in deid_patients if p.original_fhir_id}
-    
-    # Query fhir_patients table directly (patients not yet anonymized)
-    from sqlalchemy import text
-    fhir_query = text("""
-        SELECT fhir_id, gender, birth_date, resource_data, created_at
-        FROM fhir_patients
-        WHERE active = true
-        ORDER BY created_at DESC
-        LIMIT :limit
-    """)
-    fhir_results = db.execute(fhir_query, {"limit": limit * 2}).fetchall()  # Get more to account for filtering
-    
-    for row in fhir_results:
-        fhir_id = row[0]
-        # Skip if already in deid_patients
-        if fhir_id in existing_fhir_ids:
-            continue
-            
-        gender = row[1]
-        birth_date = row[2]
-        resource_data = row[3] if row[3] else {}
-        
-        # Calculate age group if birth_date available
-        age_group = None
-        if birth_date:
-            from datetime import datetime
-            try:
-                if isinstance(birth_date, str):
-                    birth = datetime.strptime(birth_date[:10], '%Y-%m-%d')
-                else:
-                    birth = birth_date
-                age = (datetime.now() - birth).days // 365
-                if age < 18:
-                    age_group = "0-17"
-                elif age < 35:
-                    age_group = "18-34"
-                elif age < 50:
-                    age_group = "35-49"
-                elif age < 65:
-                    age_group = "50-64"
-                else:
-                    age_group = "65+"
-            except:
-                pass
-        
-        result.append(PatientRiskSummary(
-            patient_id=fhir_id,  # Use FHIR ID for non-anonymized patients
-            age_group=age_group,
-            gender=gender,
-            risk_score=None,
-            risk_level=None,
-            last_prediction_date=None
-        ))
+    rows = patient_service.list_patients_with_risk(
+        limit=limit, after=after, after_id=after_id
+    )
     
-    return result
+    headers = {}
+    if rows and len(rows) == limit:
+        last = rows[-1]
+        if last["created_at"] is not None:
+            headers[NEXT_CURSOR_HEADER] = last["created_at"].isoformat()
+        headers[NEXT_CURSOR_ID_HEADER] = last["patient_id"]
+    
+    # Trusted DB rows: build straight from the row mappings without
+    # re-validating each field (the extra created_at key is ignored)
+    patients = [PatientRiskSummary.model_construct(**row) for row in rows]
+    return _json_response(_PATIENT_LIST_JSON.dump_json(patients), headers)
 
 
 @app.post("/api/v1/patients", response_model=PatientCreateResponse, tags=["Patients"])
 async def create_patient(
     patient_data: PatientCreateRequest,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    client: httpx.AsyncClient = Depends(get_http_client)
 ):
     """
     Create a new patient in FHIR via ProxyFHIR service.
@@ -522,45 +703,44 @@ async def create_patient(
     proxy_fhir_url = f"{settings.proxy_fhir_url}/api/fhir/proxy/Patient"
     
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                proxy_fhir_url,
-                json=patient_dict,
-                headers={"Content-Type": "application/fhir+json"}
-            )
-            
-            if response.status_code not in [200, 201]:
-                try:
-                    error_data = response.json()
-                    error_detail = error_data.get("detail") or error_data.get("message") or response.text or "Failed to create patient in FHIR"
-                except:
-                    error_detail = response.text or "Failed to create patient in FHIR"
-                
-                logger.error(
-                    "proxy_fhir_error",
-                    status_code=response.status_code,
-                    error=error_detail[:500]  # Truncate very long errors
-                )
-                raise HTTPException(
-                    status_code=status.HTTP_502_BAD_GATEWAY,
-                    detail=f"ProxyFHIR service error: {error_detail[:500]}"
-                )
-            
+        response = await client.post(
+            proxy_fhir_url,
+            json=patient_dict,
+            headers={"Content-Type": "application/fhir+json"}
+        )
+        
+        if response.status_code not in [200, 201]:
             try:
-                fhir_response = response.json()
-            except Exception as e:
-                logger.error("proxy_fhir_json_error", error=str(e), response_text=response.text[:200])
-                raise HTTPException(
-                    status_code=status.HTTP_502_BAD_GATEWAY,
-                    detail="Invalid JSON response from ProxyFHIR service"
-                )
+                error_data = response.json()
+                error_detail = error_data.get("detail") or error_data.get("message") or response.text or "Failed to create patient in FHIR"
+            except:
+                error_detail = response.text or "Failed to create patient in FHIR"
             
-            # Return simplified response
-            return PatientCreateResponse(
-                id=fhir_response.get("id", ""),
-                resourceType=fhir_response.get("resourceType", "Patient"),
-                status="created"
+            logger.error(
+                "proxy_fhir_error",
+                status_code=response.status_code,
+                error=error_detail[:500]  # Truncate very long errors
+            )
+            raise HTTPException(
+                status_code=status.HTTP_502_BAD_GATEWAY,
+                detail=f"ProxyFHIR service error: {error_detail[:500]}"
+            )
+        
+        try:
+            fhir_response = response.json()
+        except Exception as e:
+            logger.error("proxy_fhir_json_error", error=str(e), response_text=response.text[:200])
+            raise HTTPException(
+                status_code=status.HTTP_502_BAD_GATEWAY,
+                detail="Invalid JSON response from ProxyFHIR service"
             )
+        
+        # Return simplified response
+        return PatientCreateResponse(
+            id=fhir_response.get("id", ""),
+            resourceType=fhir_response.get("resourceType", "Patient"),
+            status="created"
+        )
     
     except httpx.TimeoutException:
         logger.error("proxy_fhir_timeout", url=proxy_fhir_url)
@@ -587,7 +767,7 @@ async def create_patient(
 
 
 @app.delete("/api/v1/patients/{patient_id}", tags=["Patients"])
-async def delete_patient(
+def delete_patient(
     patient_id: str,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -624,39 +804,66 @@ async def get_high_risk_patients(
     current_user: User = Depends(get_current_user)
 ):
     """
-    Get list of high-risk patients above threshold.
+    Get list of high-risk patients above threshold (cached in Redis for a
+    short TTL per threshold/limit/service).
+    """
+    cache_key = high_risk_cache_key(threshold, limit, service)
+    payload = await get_cache(cache_key)
+    if payload is not None:
+        CACHE_LOOKUPS.labels(cache="high_risk", result="hit").inc()
+        return ORJSONResponse(payload)
+    CACHE_LOOKUPS.labels(cache="high_risk", result="miss").inc()
+    
+    def load() -> Dict[str, Any]:
+        patients = RiskScoreService(db).get_high_risk_patients(threshold, limit, service)
+        # The select's labels already match PatientRiskSummary, so rows go
+        # to orjson as plain dicts with no per-row model round trip
+        return {
+            "threshold": threshold,
+            "count": len(patients),
+            "patients": [dict(p) for p in patients]
+        }
+    
+    payload = await run_in_threadpool(load)
+    await set_cache(cache_key, payload, settings.high_risk_cache_ttl)
+    return ORJSONResponse(payload)
+
+
+@app.post("/api/v1/patients/predict/batch", tags=["Risk Scores"])
+async def request_new_predictions(
+    request: BatchPredictionRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    client: httpx.AsyncClient = Depends(get_http_client)
+):
+    """
+    Request new risk predictions for several patients in batched model calls.
     """
     risk_service = RiskScoreService(db)
-    patients = risk_service.get_high_risk_patients(threshold, limit, service)
-    
-    return HighRiskPatientsResponse(
-        threshold=threshold,
-        count=len(patients),
-        patients=[
-            PatientRiskSummary(
-                patient_id=p["patient_id"],
-                age_group=p["age_group"],
-                gender=p["gender"],
-                risk_score=p["risk_score"],
-                risk_level=p["risk_level"],
-                last_prediction_date=p["last_prediction_date"]
-            )
-            for p in patients
-        ]
-    )
+    result = await risk_service.request_predictions(request.patient_ids, client)
+    
+    # New predictions change these patients' latest scores and the counts
+    await delete_cache_many([
+        risk_score_cache_key(prediction["pseudo_patient_id"])
+        for prediction in result["predictions"]
+    ])
+    invalidate_dashboard_stats()
+    
+    return result
 
 
 @app.post("/api/v1/patients/{patient_id}/predict", tags=["Risk Scores"])
 async def request_new_prediction(
     patient_id: str,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    client: httpx.AsyncClient = Depends(get_http_client)
 ):
     """
     Request a new risk prediction for a patient.
     """
     risk_service = RiskScoreService(db)
-    result = await risk_service.request_prediction(patient_id)
+    result = await risk_service.request_prediction(patient_id, client)
     
     if not result:
         raise HTTPException(
@@ -664,6 +871,10 @@ async def request_new_prediction(
             detail="Failed to generate prediction"
         )
     
+    # A new prediction changes the patient's latest score and the risk-level counts
+    await delete_cache(risk_score_cache_key(patient_id))
+    invalidate_dashboard_stats()
+    
     return result
 
 
@@ -677,10 +888,28 @@ async def get_dashboard_stats(
     current_user: User = Depends(get_current_user)
 ):
     """
-    Get dashboard statistics.
+    Get dashboard statistics (cached in-process, then in Redis, for a short TTL).
     """
-    risk_service = RiskScoreService(db)
-    return risk_service.get_dashboard_stats()
+    global _dashboard_local, _dashboard_local_ts
+    if (
+        _dashboard_local is not None
+        and time.monotonic() - _dashboard_local_ts < DASHBOARD_LOCAL_TTL_SECONDS
+    ):
+        CACHE_LOOKUPS.labels(cache="dashboard_local", result="hit").inc()
+        return _dashboard_local
+    CACHE_LOOKUPS.labels(cache="dashboard_local", result="miss").inc()
+    
+    stats = await get_cache(DASHBOARD_CACHE_KEY)
+    if stats is not None:
+        CACHE_LOOKUPS.labels(cache="dashboard", result="hit").inc()
+    else:
+        CACHE_LOOKUPS.labels(cache="dashboard", result="miss").inc()
+        risk_service = RiskScoreService(db)
+        stats = await run_in_threadpool(risk_service.get_dashboard_stats)
+        await set_cache(DASHBOARD_CACHE_KEY, stats, settings.dashboard_cache_ttl)
+    
+    _dashboard_local, _dashboard_local_ts = stats, time.monotonic()
+    return stats
 
 
 # ============================================
@@ -688,7 +917,7 @@ async def get_dashboard_stats(
 # ============================================
 
 @app.post("/api/v1/users", response_model=UserResponse, tags=["User Management"])
-async def create_user(
+def create_user(
     request: UserCreateRequest,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -696,6 +925,10 @@ async def create_user(
     """
     Create a new user (all authenticated users).
     """
+    # bcrypt takes a few hundred ms of CPU; hash before the first query so no
+    # pooled connection is checked out meanwhile
+    password_hash = get_password_hash(request.password)
+    
     user_service = UserService(db)
     
     # Check if username exists
@@ -712,10 +945,10 @@ async def create_user(
             detail="Email already exists"
         )
     
-    user = user_service.create_user(
+    user = user_service.create_user_hashed(
         username=request.username,
         email=request.email,
-        password=request.password,
+        password_hash=password_hash,
         full_name=request.full_name,
         role=request.role,
         department=request.department
@@ -725,15 +958,24 @@ async def create_user(
 
 
 @app.get("/api/v1/users", response_model=List[UserResponse], tags=["User Management"])
-async def list_users(
+def list_users(
+    response: Response,
+    limit: Optional[int] = None,
+    after: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
-    List all users (all authenticated users).
+    List users by username (all authenticated users).
+    
+    All users are returned unless `limit` is given; then a full page sets the
+    X-Next-Cursor header to the username to pass as `after`.
     """
     user_service = UserService(db)
-    return user_service.get_all_users()
+    users = user_service.get_all_users(limit, after)
+    if limit and len(users) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = users[-1]["username"]
+    return users
 
 
 # ============================================
@@ -741,19 +983,38 @@ async def list_users(
 # ============================================
 
 @app.get("/api/v1/audit/logs", response_model=List[AuditLogEntry], tags=["Audit"])
-async def get_audit_logs(
+def get_audit_logs(
     limit: int = 100,
+    before: Optional[datetime] = None,
+    before_id: Optional[UUID] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     Get recent audit logs (all authenticated users).
+    
+    When a full page is returned, the X-Next-Cursor and X-Next-Cursor-Id
+    headers hold the values to pass as `before` and `before_id`.
     """
     audit_service = AuditService(db)
-    return audit_service.get_recent_logs(limit)
+    logs = audit_service.get_recent_logs(limit, before, before_id)
+    headers = {}
+    if logs and len(logs) == limit and logs[-1].request_timestamp is not None:
+        headers[NEXT_CURSOR_HEADER] = logs[-1].request_timestamp.isoformat()
+        headers[NEXT_CURSOR_ID_HEADER] = str(logs[-1].id)
+    return _json_response(
+        _AUDIT_LOG_JSON.dump_json(_AUDIT_LOG_JSON.validate_python(logs)), headers
+    )
 
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host=settings.service_host, port=settings.service_port)
+    uvicorn.run(
+        "app.main:app",
+        host=settings.service_host,
+        port=settings.service_port,
+        loop="uvloop",
+        http="httptools",
+        workers=settings.service_workers
+    )
 
@@ -1,5 +1,5 @@
 """SQLAlchemy models for ScoreAPI service."""
-from sqlalchemy import Column, String, Integer, Boolean, DateTime, Float, JSON, Text, ARRAY
+from sqlalchemy import Column, String, Integer, Boolean, DateTime, Float, JSON, Text, ARRAY, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 import uuid
@@ -40,6 +40,11 @@ class ApiAuditLog(Base):
     request_timestamp = Column(DateTime(timezone=True), server_default=func.now())
     response_time_ms = Column(Integer)
 
+    __table_args__ = (
+        # Newest-first listing, keyset-paginated on (request_timestamp, id)
+        Index("ix_audit_request_ts_id", request_timestamp.desc(), id.desc()),
+    )
+
 
 class RiskPrediction(Base):
     """Risk predictions (read-only)."""
@@ -64,6 +69,19 @@ class RiskPrediction(Base):
     created_at = Column(DateTime(timezone=True))
     updated_at = Column(DateTime(timezone=True))
 
+    __table_args__ = (
+        # Same definitions as model-risque; latest prediction per patient
+        Index("ix_rp_pid_ts", "pseudo_patient_id", prediction_timestamp.desc()),
+        # High-risk listing (risk_score >= threshold ORDER BY risk_score DESC)
+        Index("ix_rp_score_ts", risk_score.desc(), prediction_timestamp.desc()),
+        # Partial index over the high-risk tail only: the default 0.7 threshold
+        # (and any >= 0.5) is served from a far smaller index; lower
+        # thresholds fall back to ix_rp_score_ts
+        Index("ix_rp_high_risk", risk_score.desc(), postgresql_where=risk_score >= 0.5),
+        # Range scans on prediction time (predictions made today)
+        Index("idx_predictions_timestamp", prediction_timestamp),
+    )
+
 
 class DeidPatient(Base):
     """De-identified patients (read-only)."""
@@ -79,4 +97,9 @@ class DeidPatient(Base):
     created_at = Column(DateTime(timezone=True))
     updated_at = Column(DateTime(timezone=True))
 
+    __table_args__ = (
+        # Newest-first patient listing, keyset-paginated on (created_at, pseudo_id)
+        Index("ix_deid_created_pid", created_at.desc().nulls_last(), pseudo_id.desc()),
+    )
+
 
@@ -80,6 +80,11 @@ class RiskScoreResponse(BaseModel):
     model_version: str
 
 
+class BatchPredictionRequest(BaseModel):
+    """Request predictions for several patients."""
+    patient_ids: List[str] = Field(..., min_length=1)
+
+
 class PatientRiskSummary(BaseModel):
     """Patient risk summary."""
     patient_id: str
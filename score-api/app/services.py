@@ -1,18 +1,148 @@
 """Service layer for ScoreAPI."""
-from datetime import datetime, date
-from typing import Optional, Dict, Any, List
+import asyncio
+import io
+import json
+import uuid
+from datetime import datetime, date, timedelta, timezone
+from typing import Optional, Dict, Any, List, Sequence
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, insert, select, update, true, tuple_, text, bindparam, Integer, String, DateTime, RowMapping
+from starlette.concurrency import run_in_threadpool
 import httpx
 import structlog
 
 from app.config import get_settings
 from app.models import User, ApiAuditLog, RiskPrediction, DeidPatient
 from app.auth import get_password_hash
+from app.cache import get_cache, set_cache
 
 settings = get_settings()
 logger = structlog.get_logger()
 
+# Raw SQL statements, parsed once at import rather than on every call.
+# Anonymized patients with their latest prediction and active FHIR patients
+# not yet anonymized (age groups bucketed from the ISO birth_date string),
+# newest first (NULL created_at last), keyset-paginated on
+# (created_at, patient_id). :after/:after_id are the last row's values; a page
+# ending in the NULL created_at tail continues with :after_id alone.
+_PATIENT_LIST_SQL = text("""
+    (
+        SELECT dp.pseudo_id AS patient_id, dp.age_group, dp.gender,
+               rp.risk_score, rp.risk_level,
+               rp.prediction_timestamp AS last_prediction_date,
+               dp.created_at
+        FROM deid_patients dp
+        LEFT JOIN LATERAL (
+            SELECT risk_score, risk_level, prediction_timestamp
+            FROM risk_predictions
+            WHERE pseudo_patient_id = dp.pseudo_id
+            ORDER BY prediction_timestamp DESC
+            LIMIT 1
+        ) rp ON true
+        WHERE (CAST(:after AS timestamptz) IS NULL AND CAST(:after_id AS varchar) IS NULL)
+           OR (CAST(:after AS timestamptz) IS NOT NULL
+               AND (dp.created_at IS NULL
+                    OR (dp.created_at, dp.pseudo_id) < (:after, COALESCE(CAST(:after_id AS varchar), ''))))
+           OR (CAST(:after AS timestamptz) IS NULL
+               AND dp.created_at IS NULL AND dp.pseudo_id < :after_id)
+        ORDER BY dp.created_at DESC NULLS LAST, dp.pseudo_id DESC
+        LIMIT :limit
+    )
+    UNION ALL
+    (
+        SELECT fp.fhir_id,
+               CASE
+                   WHEN bd.birth_date IS NULL THEN NULL
+                   WHEN age(bd.birth_date) < interval '18 years' THEN '0-17'
+                   WHEN age(bd.birth_date) < interval '35 years' THEN '18-34'
+                   WHEN age(bd.birth_date) < interval '50 years' THEN '35-49'
+                   WHEN age(bd.birth_date) < interval '65 years' THEN '50-64'
+                   ELSE '65+'
+               END,
+               fp.gender,
+               NULL, NULL, NULL,
+               fp.created_at
+        FROM fhir_patients fp
+        -- Leading YYYY-MM-DD of birth_date, NULL unless it is a real calendar
+        -- date: a bare CAST of e.g. 2020-02-30 would fail the whole listing.
+        -- CASE branches are checked in order, so each guards the next.
+        CROSS JOIN LATERAL (
+            SELECT CASE
+                WHEN fp.birth_date !~ '^[0-9]{4}-(0[1-9]|1[0-2])-(0[1-9]|[12][0-9]|3[01])' THEN NULL
+                WHEN left(fp.birth_date, 4) = '0000' THEN NULL
+                WHEN CAST(substr(fp.birth_date, 9, 2) AS int) > extract(day from
+                         make_date(CAST(left(fp.birth_date, 4) AS int),
+                                   CAST(substr(fp.birth_date, 6, 2) AS int), 1)
+                         + interval '1 month' - interval '1 day') THEN NULL
+                ELSE CAST(left(fp.birth_date, 10) AS date)
+            END AS birth_date
+        ) bd
+        WHERE fp.active = true
+          AND ((CAST(:after AS timestamptz) IS NULL AND CAST(:after_id AS varchar) IS NULL)
+               OR (CAST(:after AS timestamptz) IS NOT NULL
+                   AND (fp.created_at IS NULL
+                        OR (fp.created_at, fp.fhir_id) < (:after, COALESCE(CAST(:after_id AS varchar), ''))))
+               OR (CAST(:after AS timestamptz) IS NULL
+                   AND fp.created_at IS NULL AND fp.fhir_id < :after_id))
+          AND NOT EXISTS (
+              SELECT 1 FROM deid_patients d
+              WHERE d.original_fhir_id = fp.fhir_id
+          )
+        ORDER BY fp.created_at DESC NULLS LAST, fp.fhir_id DESC
+        LIMIT :limit
+    )
+    ORDER BY created_at DESC NULLS LAST, patient_id DESC
+    LIMIT :limit
+""").bindparams(
+    bindparam("limit", type_=Integer),
+    bindparam("after", type_=DateTime(timezone=True)),
+    bindparam("after_id", type_=String)
+)
+
+# Patient deletion in one statement: drop the de-identified record and its
+# predictions, and deactivate the FHIR source row. A bare FHIR id (no deid
+# record) only deactivates that row. The outer SELECT reports what matched.
+_DELETE_PATIENT_SQL = text("""
+    WITH d AS (
+        DELETE FROM deid_patients
+        WHERE pseudo_id = :pid
+        RETURNING original_fhir_id
+    ),
+    p AS (
+        DELETE FROM risk_predictions
+        WHERE pseudo_patient_id = :pid
+          AND EXISTS (SELECT 1 FROM d)
+    ),
+    f AS (
+        UPDATE fhir_patients
+        SET active = false
+        WHERE fhir_id IN (SELECT original_fhir_id FROM d)
+           OR (fhir_id = :pid AND NOT EXISTS (SELECT 1 FROM d))
+        RETURNING 1
+    )
+    SELECT (SELECT COUNT(*) FROM d) AS deid_deleted,
+           (SELECT COUNT(*) FROM f) AS fhir_deactivated
+""")
+
+# Dashboard aggregates precomputed in mv_dashboard_stats (created by
+# database/init/complete_schema.sql); the app only refreshes and reads it
+_DASHBOARD_VIEW_REFRESH_SQL = text("REFRESH MATERIALIZED VIEW CONCURRENTLY mv_dashboard_stats")
+_DASHBOARD_VIEW_AGE_SQL = text(
+    "SELECT EXTRACT(EPOCH FROM now() - refreshed_at) FROM mv_dashboard_stats"
+)
+# Transaction-scoped advisory lock so only one worker refreshes at a time
+DASHBOARD_VIEW_LOCK_KEY = 8_300_001
+_DASHBOARD_VIEW_LOCK_SQL = text("SELECT pg_try_advisory_xact_lock(:key)")
+_DASHBOARD_VIEW_SELECT_SQL = text("""
+    SELECT total_patients, high_risk_patients, medium_risk_patients,
+           low_risk_patients, predictions_today, average_risk_score
+    FROM mv_dashboard_stats
+""")
+
+# Set once a refresh has succeeded in this process; until then (or if the view
+# is missing) stats are computed live
+_dashboard_view_ready = False
+
 
 class UserService:
     """Service for user management."""
@@ -30,7 +160,7 @@ class UserService:
         department: Optional[str] = None
     ) -> User:
         """Create a new user."""
-        user = User(
+        return self.create_user_hashed(
             username=username,
             email=email,
             password_hash=get_password_hash(password),
@@ -38,6 +168,25 @@ class UserService:
             role=role,
             department=department
         )
+    
+    def create_user_hashed(
+        self,
+        username: str,
+        email: str,
+        password_hash: str,
+        full_name: Optional[str] = None,
+        role: str = "clinician",
+        department: Optional[str] = None
+    ) -> User:
+        """Create a new user from an already computed password hash."""
+        user = User(
+            username=username,
+            email=email,
+            password_hash=password_hash,
+            full_name=full_name,
+            role=role,
+            department=department
+        )
         self.db.add(user)
         self.db.commit()
         self.db.refresh(user)
@@ -51,14 +200,46 @@ class UserService:
         """Get user by email."""
         return self.db.query(User).filter(User.email == email).first()
     
-    def update_last_login(self, user: User):
-        """Update user's last login timestamp."""
-        user.last_login = datetime.now()
+    def update_last_login(self, user: User) -> datetime:
+        """Update user's last login timestamp and return the new value."""
+        # Direct UPDATE ... RETURNING: no ORM flush, and the instance is not
+        # reloaded afterwards
+        last_login = self.db.execute(
+            update(User)
+            .where(User.id == user.id)
+            .values(last_login=func.now())
+            .returning(User.last_login)
+            .execution_options(synchronize_session=False)
+        ).scalar_one()
         self.db.commit()
+        return last_login
     
-    def get_all_users(self) -> List[User]:
-        """Get all users."""
-        return self.db.query(User).all()
+    def get_all_users(
+        self,
+        limit: Optional[int] = None,
+        after: Optional[str] = None
+    ) -> Sequence[RowMapping]:
+        """
+        Get users as row mappings of the public profile columns, ordered by
+        username. Pass the last username seen as `after` for the next page.
+        """
+        # Core select of just the listed columns: no ORM identity map, and
+        # password hashes never leave the database
+        query = select(
+            User.id,
+            User.username,
+            User.email,
+            User.full_name,
+            User.role,
+            User.department,
+            User.is_active,
+            User.last_login
+        ).order_by(User.username)
+        if after is not None:
+            query = query.where(User.username > after)
+        if limit is not None:
+            query = query.limit(limit)
+        return self.db.execute(query).mappings().all()
     
     def update_user(self, user: User, updates: Dict[str, Any]) -> User:
         """Update user fields."""
@@ -70,6 +251,42 @@ class UserService:
         return user
 
 
+# Column order for COPY into api_audit_log
+_AUDIT_COPY_COLUMNS = (
+    "id", "user_id", "endpoint", "method", "request_params", "response_status",
+    "patient_ids_accessed", "ip_address", "user_agent", "request_timestamp",
+    "response_time_ms"
+)
+
+
+def _copy_escape(text_value: str) -> str:
+    """Escape a value for COPY text format."""
+    return (
+        text_value.replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def _copy_value(column: str, value: Any) -> str:
+    """Render one audit column for COPY text format (\\N is NULL)."""
+    if value is None:
+        return "\\N"
+    if column == "request_params":
+        return _copy_escape(json.dumps(value, default=str))
+    if column == "patient_ids_accessed":
+        # Postgres array literal with every element quoted
+        elements = (
+            '"' + str(v).replace("\\", "\\\\").replace('"', '\\"') + '"'
+            for v in value
+        )
+        return _copy_escape("{" + ",".join(elements) + "}")
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return _copy_escape(str(value))
+
+
 class AuditService:
     """Service for audit logging."""
     
@@ -103,10 +320,63 @@ class AuditService:
         self.db.add(log_entry)
         self.db.commit()
     
-    def get_recent_logs(self, limit: int = 100) -> List[ApiAuditLog]:
-        """Get recent audit logs."""
-        return self.db.query(ApiAuditLog)\
-            .order_by(ApiAuditLog.request_timestamp.desc())\
+    def log_requests(self, records: List[Dict[str, Any]]):
+        """Insert a batch of audit records with one executemany and one commit."""
+        self.db.execute(insert(ApiAuditLog), records)
+        self.db.commit()
+    
+    def bulk_load_copy(self, records: List[Dict[str, Any]]) -> int:
+        """
+        Load many audit records with COPY FROM STDIN (backfills, replays).
+        
+        Records use ApiAuditLog column names; missing columns are NULL, except
+        id and request_timestamp which default as on the ORM path. Much faster
+        than INSERTs for large loads; runs inside the session's transaction.
+        """
+        buffer = io.StringIO()
+        now = datetime.now(timezone.utc)
+        for record in records:
+            row = {
+                **record,
+                "id": record.get("id") or uuid.uuid4(),
+                "request_timestamp": record.get("request_timestamp") or now
+            }
+            buffer.write("\t".join(
+                _copy_value(column, row.get(column)) for column in _AUDIT_COPY_COLUMNS
+            ))
+            buffer.write("\n")
+        buffer.seek(0)
+        
+        cursor = self.db.connection().connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY api_audit_log ({', '.join(_AUDIT_COPY_COLUMNS)}) FROM STDIN",
+                buffer
+            )
+        finally:
+            cursor.close()
+        self.db.commit()
+        return len(records)
+    
+    def get_recent_logs(
+        self,
+        limit: int = 100,
+        before: Optional[datetime] = None,
+        before_id: Optional[str] = None
+    ) -> List[ApiAuditLog]:
+        """
+        Get recent audit logs, newest first. Pass the timestamp and id of the
+        last row seen as `before`/`before_id` for the next page; the id breaks
+        ties between rows logged in the same instant.
+        """
+        query = self.db.query(ApiAuditLog)
+        if before is not None and before_id is not None:
+            query = query.filter(
+                tuple_(ApiAuditLog.request_timestamp, ApiAuditLog.id) < tuple_(before, before_id)
+            )
+        elif before is not None:
+            query = query.filter(ApiAuditLog.request_timestamp < before)
+        return query.order_by(ApiAuditLog.request_timestamp.desc(), ApiAuditLog.id.desc())\
             .limit(limit)\
             .all()
     
@@ -119,6 +389,16 @@ class AuditService:
             .all()
 
 
+# Risk score reads in flight, keyed by patient ID, so concurrent cache misses
+# for the same patient wait on one database query instead of issuing their own
+_inflight_risk_scores: Dict[str, asyncio.Future] = {}
+
+
+def risk_score_cache_key(patient_id: str) -> str:
+    """Redis key holding a patient's latest risk score."""
+    return f"riskscore:{patient_id}"
+
+
 class RiskScoreService:
     """Service for risk score operations."""
     
@@ -132,99 +412,264 @@ class RiskScoreService:
             .order_by(RiskPrediction.prediction_timestamp.desc())\
             .first()
     
+    async def get_patient_risk_score_cached(self, patient_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get latest risk score for a patient as a dict, read through the
+        Redis key riskscore:{patient_id}. Timestamps come back as ISO strings
+        on a cache hit.
+        
+        Concurrent misses for the same patient share a single database read.
+        """
+        key = risk_score_cache_key(patient_id)
+        cached = await get_cache(key)
+        if cached is not None:
+            return cached
+        
+        pending = _inflight_risk_scores.get(patient_id)
+        if pending is not None:
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                # The shared read was abandoned (its request was cancelled);
+                # read for ourselves unless it is this request being cancelled
+                if not pending.cancelled():
+                    raise
+                return await self._load_risk_score(patient_id)
+        
+        future = asyncio.get_running_loop().create_future()
+        _inflight_risk_scores[patient_id] = future
+        try:
+            result = await self._load_risk_score(patient_id)
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so an unawaited future doesn't log a warning
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            # Cancellation skips both branches above; never leave waiters on
+            # a future nobody will resolve
+            if not future.done():
+                future.cancel()
+            del _inflight_risk_scores[patient_id]
+        
+        if result is not None:
+            await set_cache(key, result, settings.risk_score_cache_ttl)
+        return result
+    
+    async def _load_risk_score(self, patient_id: str) -> Optional[Dict[str, Any]]:
+        """Read the latest prediction from the database as a cacheable dict."""
+        prediction = await run_in_threadpool(self.get_patient_risk_score, patient_id)
+        if not prediction:
+            return None
+        
+        return {
+            "pseudo_patient_id": prediction.pseudo_patient_id,
+            "risk_score": prediction.risk_score,
+            "risk_level": prediction.risk_level,
+            "confidence_lower": prediction.confidence_lower,
+            "confidence_upper": prediction.confidence_upper,
+            "shap_values": prediction.shap_values,
+            "top_risk_factors": prediction.top_risk_factors,
+            "prediction_timestamp": prediction.prediction_timestamp,
+            "discharge_date": prediction.discharge_date
+        }
+    
     def get_high_risk_patients(
         self, 
         threshold: float = 0.7, 
         limit: int = 100,
         service: Optional[str] = None
-    ) -> List[Dict[str, Any]]:
-        """Get high risk patients."""
-        query = self.db.query(
-            RiskPrediction.pseudo_patient_id,
-            RiskPrediction.risk_score,
+    ) -> Sequence[RowMapping]:
+        """Get high risk patients as row mappings shaped like PatientRiskSummary."""
+        return self.db.execute(
+            select(
+                RiskPrediction.pseudo_patient_id.label("patient_id"),
+                RiskPrediction.risk_score,
+                RiskPrediction.risk_level,
+                RiskPrediction.prediction_timestamp.label("last_prediction_date"),
+                DeidPatient.age_group,
+                DeidPatient.gender
+            ).outerjoin(
+                DeidPatient,
+                RiskPrediction.pseudo_patient_id == DeidPatient.pseudo_id
+            ).where(
+                RiskPrediction.risk_score >= threshold
+            ).order_by(
+                RiskPrediction.risk_score.desc()
+            ).limit(limit)
+        ).mappings().all()
+    
+    def get_dashboard_stats(self) -> Dict[str, Any]:
+        """Get dashboard statistics from the materialized view when it is ready."""
+        if _dashboard_view_ready:
+            row = self.db.execute(_DASHBOARD_VIEW_SELECT_SQL).mappings().first()
+            if row is not None:
+                return {
+                    **row,
+                    "average_risk_score": float(row["average_risk_score"] or 0),
+                    "model_accuracy": 0.82  # From model training metrics
+                }
+        return self.compute_dashboard_stats()
+    
+    def refresh_dashboard_view(self, min_age_seconds: float = 0.0) -> bool:
+        """
+        Refresh the dashboard stats view unless it was refreshed less than
+        `min_age_seconds` ago or another worker is refreshing it right now.
+        Returns True if this call refreshed it.
+        """
+        global _dashboard_view_ready
+        try:
+            # refreshed_at is stamped by the last refresh, from any worker
+            age = self.db.execute(_DASHBOARD_VIEW_AGE_SQL).scalar()
+            _dashboard_view_ready = True
+            if age is not None and age < min_age_seconds:
+                self.db.rollback()
+                return False
+            if not self.db.execute(
+                _DASHBOARD_VIEW_LOCK_SQL, {"key": DASHBOARD_VIEW_LOCK_KEY}
+            ).scalar():
+                self.db.rollback()
+                return False
+            self.db.execute(_DASHBOARD_VIEW_REFRESH_SQL)
+            self.db.commit()
+        except Exception:
+            # Missing view (schema script not applied): keep serving live stats
+            _dashboard_view_ready = False
+            raise
+        return True
+    
+    def compute_dashboard_stats(self) -> Dict[str, Any]:
+        """
+        Compute dashboard statistics directly from the base tables, in one
+        statement mirroring mv_dashboard_stats.
+        """
+        # Latest prediction per patient, bucketed by risk level with FILTER
+        latest = select(
             RiskPrediction.risk_level,
-            RiskPrediction.prediction_timestamp,
-            DeidPatient.age_group,
-            DeidPatient.gender
-        ).outerjoin(
-            DeidPatient,
-            RiskPrediction.pseudo_patient_id == DeidPatient.pseudo_id
-        ).filter(
-            RiskPrediction.risk_score >= threshold
+            RiskPrediction.risk_score
+        ).distinct(
+            RiskPrediction.pseudo_patient_id
         ).order_by(
-            RiskPrediction.risk_score.desc()
-        ).limit(limit)
-        
-        results = query.all()
+            RiskPrediction.pseudo_patient_id,
+            RiskPrediction.prediction_timestamp.desc()
+        ).cte("latest")
         
-        return [
-            {
-                "patient_id": r.pseudo_patient_id,
-                "risk_score": r.risk_score,
-                "risk_level": r.risk_level,
-                "last_prediction_date": r.prediction_timestamp,
-                "age_group": r.age_group,
-                "gender": r.gender
-            }
-            for r in results
-        ]
-    
-    def get_dashboard_stats(self) -> Dict[str, Any]:
-        """Get dashboard statistics."""
-        total_patients = self.db.query(
+        total_patients = select(
             func.count(func.distinct(DeidPatient.pseudo_id))
-        ).scalar() or 0
-        
-        high_risk = self.db.query(func.count(RiskPrediction.id)).filter(
-            RiskPrediction.risk_level == "HIGH"
-        ).scalar() or 0
-        
-        medium_risk = self.db.query(func.count(RiskPrediction.id)).filter(
-            RiskPrediction.risk_level == "MEDIUM"
-        ).scalar() or 0
-        
-        low_risk = self.db.query(func.count(RiskPrediction.id)).filter(
-            RiskPrediction.risk_level == "LOW"
-        ).scalar() or 0
+        ).scalar_subquery()
         
+        # Half-open range on the raw column so the timestamp index is usable
         today = date.today()
-        predictions_today = self.db.query(func.count(RiskPrediction.id)).filter(
-            func.date(RiskPrediction.prediction_timestamp) == today
-        ).scalar() or 0
+        predictions_today = select(func.count(RiskPrediction.id)).where(
+            RiskPrediction.prediction_timestamp >= today,
+            RiskPrediction.prediction_timestamp < today + timedelta(days=1)
+        ).scalar_subquery()
         
-        avg_score = self.db.query(func.avg(RiskPrediction.risk_score)).scalar()
+        row = self.db.execute(
+            select(
+                total_patients.label("total_patients"),
+                func.count().filter(latest.c.risk_level == "HIGH").label("high_risk"),
+                func.count().filter(latest.c.risk_level == "MEDIUM").label("medium_risk"),
+                func.count().filter(latest.c.risk_level == "LOW").label("low_risk"),
+                predictions_today.label("predictions_today"),
+                func.avg(latest.c.risk_score).label("avg_score")
+            ).select_from(latest)
+        ).one()
         
         return {
-            "total_patients": total_patients,
-            "high_risk_patients": high_risk,
-            "medium_risk_patients": medium_risk,
-            "low_risk_patients": low_risk,
-            "predictions_today": predictions_today,
-            "average_risk_score": float(avg_score) if avg_score else 0,
+            "total_patients": row.total_patients or 0,
+            "high_risk_patients": row.high_risk,
+            "medium_risk_patients": row.medium_risk,
+            "low_risk_patients": row.low_risk,
+            "predictions_today": row.predictions_today or 0,
+            "average_risk_score": float(row.avg_score) if row.avg_score else 0,
             "model_accuracy": 0.82  # From model training metrics
         }
     
-    async def request_prediction(self, patient_id: str) -> Optional[Dict[str, Any]]:
-        """Request a new prediction from the model service."""
+    async def request_prediction(
+        self,
+        patient_id: str,
+        client: httpx.AsyncClient
+    ) -> Optional[Dict[str, Any]]:
+        """Request a new prediction from the model service using a shared client."""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{settings.model_service_url}/api/predict",
-                    json={"pseudo_patient_id": patient_id},
-                    timeout=30.0
+            response = await client.post(
+                f"{settings.model_service_url}/api/predict",
+                json={"pseudo_patient_id": patient_id},
+                timeout=30.0
+            )
+            if response.status_code == 200:
+                return response.json()
+            else:
+                logger.warning(
+                    "Prediction request failed",
+                    status=response.status_code,
+                    patient_id=patient_id
                 )
-                if response.status_code == 200:
-                    return response.json()
-                else:
-                    logger.warning(
-                        "Prediction request failed",
-                        status=response.status_code,
-                        patient_id=patient_id
-                    )
-                    return None
+                return None
         except Exception as e:
             logger.error("Error requesting prediction", error=str(e))
             return None
+    
+    async def request_predictions(
+        self,
+        patient_ids: List[str],
+        client: httpx.AsyncClient
+    ) -> Dict[str, Any]:
+        """
+        Request predictions for many patients through the model service's
+        batch endpoint, in chunks of prediction_batch_size sent concurrently.
+        """
+        size = settings.prediction_batch_size
+        chunks = [patient_ids[i:i + size] for i in range(0, len(patient_ids), size)]
+        responses = await asyncio.gather(
+            *(self._request_prediction_batch(chunk, client) for chunk in chunks)
+        )
+        
+        predictions: List[Dict[str, Any]] = []
+        errors: List[Dict[str, str]] = []
+        for chunk, result in zip(chunks, responses):
+            if result is None:
+                errors.extend(
+                    {"pseudo_patient_id": pid, "error": "Prediction request failed"} for pid in chunk
+                )
+                continue
+            predictions.extend(result["predictions"])
+            errors.extend(result["errors"])
+        
+        return {
+            "total_processed": len(patient_ids),
+            "successful": len(predictions),
+            "failed": len(errors),
+            "predictions": predictions,
+            "errors": errors
+        }
+    
+    async def _request_prediction_batch(
+        self,
+        patient_ids: List[str],
+        client: httpx.AsyncClient
+    ) -> Optional[Dict[str, Any]]:
+        """POST one chunk to the model service's batch prediction endpoint."""
+        try:
+            response = await client.post(
+                f"{settings.model_service_url}/api/predict/batch",
+                json={"pseudo_patient_ids": patient_ids},
+                timeout=60.0
+            )
+            if response.status_code == 200:
+                return response.json()
+            logger.warning(
+                "Batch prediction request failed",
+                status=response.status_code,
+                count=len(patient_ids)
+            )
+            return None
+        except Exception as e:
+            logger.error("Error requesting batch prediction", error=str(e))
+            return None
 
 
 class PatientService:
@@ -256,64 +701,57 @@ class PatientService:
         return query.limit(limit).all()
     
     def get_patient_summary(self, patient_id: str) -> Optional[Dict[str, Any]]:
-        """Get patient summary with risk information."""
-        patient = self.get_patient(patient_id)
-        if not patient:
-            return None
+        """Get patient summary with risk information in one round trip."""
+        # Latest prediction joined LATERAL, so the patient and its score
+        # come back together instead of as two queries
+        latest = select(
+            RiskPrediction.risk_score,
+            RiskPrediction.risk_level,
+            RiskPrediction.prediction_timestamp
+        ).where(
+            RiskPrediction.pseudo_patient_id == DeidPatient.pseudo_id
+        ).order_by(
+            RiskPrediction.prediction_timestamp.desc()
+        ).limit(1).lateral("latest_prediction")
         
-        # Get latest risk prediction
-        prediction = self.db.query(RiskPrediction).filter(
-            RiskPrediction.pseudo_patient_id == patient_id
-        ).order_by(RiskPrediction.prediction_timestamp.desc()).first()
+        row = self.db.execute(
+            select(
+                DeidPatient.pseudo_id.label("patient_id"),
+                DeidPatient.age_group,
+                DeidPatient.gender,
+                latest.c.risk_score,
+                latest.c.risk_level,
+                latest.c.prediction_timestamp.label("last_prediction_date")
+            ).outerjoin(latest, true()).where(DeidPatient.pseudo_id == patient_id)
+        ).mappings().first()
         
-        return {
-            "patient_id": patient.pseudo_id,
-            "age_group": patient.age_group,
-            "gender": patient.gender,
-            "risk_score": prediction.risk_score if prediction else None,
-            "risk_level": prediction.risk_level if prediction else None,
-            "last_prediction_date": prediction.prediction_timestamp if prediction else None
-        }
+        return dict(row) if row else None
+    
+    def list_patients_with_risk(
+        self,
+        limit: int = 100,
+        after: Optional[datetime] = None,
+        after_id: Optional[str] = None
+    ) -> Sequence[RowMapping]:
+        """
+        List anonymized patients with their latest risk and FHIR patients that
+        have not been anonymized yet, newest first, in a single round trip.
+        
+        Pass the created_at and patient_id of the last row seen as `after` and
+        `after_id` to get the next page (`after_id` alone once the listing has
+        reached rows without a created_at). FHIR age groups are bucketed in
+        SQL from the ISO birth_date string; missing, malformed or impossible
+        dates (e.g. 2020-02-30) yield a NULL age group.
+        """
+        return self.db.execute(
+            _PATIENT_LIST_SQL, {"limit": limit, "after": after, "after_id": after_id}
+        ).mappings().all()
     
     def delete_patient(self, patient_id: str) -> bool:
         """Delete a patient by FHIR ID or pseudo ID. Returns True if deleted."""
-        from sqlalchemy import text
-        
-        # First, try to find in deid_patients by pseudo_id
-        deid_patient = self.db.query(DeidPatient).filter(
-            DeidPatient.pseudo_id == patient_id
-        ).first()
-        
-        if deid_patient:
-            # Delete from deid_patients
-            original_fhir_id = deid_patient.original_fhir_id
-            self.db.delete(deid_patient)
-            
-            # Also delete from fhir_patients if exists
-            fhir_query = text("""
-                UPDATE fhir_patients 
-                SET active = false 
-                WHERE fhir_id = :fhir_id
-            """)
-            self.db.execute(fhir_query, {"fhir_id": original_fhir_id})
-            
-            # Delete related risk predictions
-            self.db.query(RiskPrediction).filter(
-                RiskPrediction.pseudo_patient_id == patient_id
-            ).delete()
-            
-            self.db.commit()
-            return True
-        
-        # If not in deid_patients, try to delete from fhir_patients directly
-        fhir_query = text("""
-            UPDATE fhir_patients 
-            SET active = false 
-            WHERE fhir_id = :fhir_id
-        """)
-        result = self.db.execute(fhir_query, {"fhir_id": patient_id})
+        row = self.db.execute(_DELETE_PATIENT_SQL, {"pid": patient_id}).one()
         self.db.commit()
         
-        return result.rowcount > 0
+        return row.deid_deleted > 0 or row.fhir_deactivated > 0
 
 
@@ -0,0 +1,56 @@
+"""Round-trip tests for the COPY-based audit log loader."""
+import uuid
+
+from app.models import ApiAuditLog
+from app.services import AuditService
+
+# Everything COPY text format or an array literal treats specially
+AWKWARD = 'tab\there, newline\nthere, cr\r, "quoted", back\\slash, \\N, {braces}, a,b'
+
+
+def test_bulk_load_copy_round_trips_special_characters(db):
+    """Tabs, newlines, quotes and backslashes survive COPY in every column type."""
+    record_id = uuid.uuid4()
+    params = {"query": AWKWARD, "nested": {"values": [AWKWARD, None, 1.5]}}
+    patient_ids = [AWKWARD, "plain", "", "NULL", "ends with \\"]
+
+    loaded = AuditService(db).bulk_load_copy([{
+        "id": record_id,
+        "endpoint": "/api/v1/" + AWKWARD,
+        "method": "GET",
+        "request_params": params,
+        "response_status": 200,
+        "patient_ids_accessed": patient_ids,
+        "user_agent": AWKWARD,
+        "response_time_ms": 7
+    }])
+
+    assert loaded == 1
+    row = db.query(ApiAuditLog).filter(ApiAuditLog.id == record_id).one()
+    assert row.endpoint == "/api/v1/" + AWKWARD
+    assert row.request_params == params
+    assert row.patient_ids_accessed == patient_ids
+    assert row.user_agent == AWKWARD
+    assert row.response_status == 200
+    assert row.response_time_ms == 7
+
+
+def test_bulk_load_copy_missing_columns_are_null(db):
+    """Omitted columns load as NULL; id and timestamp get defaults."""
+    endpoint = f"/api/v1/copy-defaults/{uuid.uuid4()}"
+
+    loaded = AuditService(db).bulk_load_copy([
+        {"endpoint": endpoint, "method": "GET"},
+        {"endpoint": endpoint, "method": "POST", "patient_ids_accessed": []}
+    ])
+
+    assert loaded == 2
+    rows = db.query(ApiAuditLog).filter(ApiAuditLog.endpoint == endpoint)\
+        .order_by(ApiAuditLog.method).all()
+    assert [row.method for row in rows] == ["GET", "POST"]
+    assert rows[0].id != rows[1].id
+    assert all(row.request_timestamp is not None for row in rows)
+    assert rows[0].request_params is None
+    assert rows[0].patient_ids_accessed is None
+    assert rows[0].user_agent is None
+    assert rows[1].patient_ids_accessed == []
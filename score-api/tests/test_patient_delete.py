@@ -0,0 +1,95 @@
+"""Patient deletion by pseudo id or bare FHIR id."""
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import text
+
+from app.models import DeidPatient, RiskPrediction
+from app.services import PatientService
+
+
+def fhir_active(db, fhir_id):
+    """The active flag of a FHIR patient row."""
+    return db.execute(
+        text("SELECT active FROM fhir_patients WHERE fhir_id = :fhir_id"),
+        {"fhir_id": fhir_id}
+    ).scalar_one()
+
+
+@pytest.fixture
+def patient(fhir_patients):
+    """A FHIR patient, its anonymized record and one prediction."""
+    db = fhir_patients
+    suffix = uuid.uuid4().hex[:8]
+    fhir_id = f"fhir-{suffix}"
+    pseudo_id = f"pseudo-{suffix}"
+    db.execute(
+        text("INSERT INTO fhir_patients (fhir_id, gender, active) VALUES (:fhir_id, 'female', true)"),
+        {"fhir_id": fhir_id}
+    )
+    db.add(DeidPatient(
+        id=uuid.uuid4(),
+        original_fhir_id=fhir_id,
+        pseudo_id=pseudo_id,
+        deid_data={},
+        created_at=datetime.now(timezone.utc)
+    ))
+    db.add(RiskPrediction(
+        id=uuid.uuid4(),
+        pseudo_patient_id=pseudo_id,
+        risk_score=0.8,
+        risk_level="HIGH",
+        prediction_timestamp=datetime.now(timezone.utc)
+    ))
+    db.flush()
+    return fhir_id, pseudo_id
+
+
+def test_delete_by_pseudo_id(db, patient):
+    """The deid record and its predictions go; the FHIR source is deactivated."""
+    fhir_id, pseudo_id = patient
+
+    assert PatientService(db).delete_patient(pseudo_id) is True
+
+    assert db.query(DeidPatient).filter(DeidPatient.pseudo_id == pseudo_id).count() == 0
+    assert db.query(RiskPrediction).filter(
+        RiskPrediction.pseudo_patient_id == pseudo_id
+    ).count() == 0
+    assert fhir_active(db, fhir_id) is False
+
+
+def test_delete_by_bare_fhir_id(db, fhir_patients):
+    """A FHIR patient without a deid record is only deactivated."""
+    fhir_id = f"fhir-{uuid.uuid4().hex[:8]}"
+    db.execute(
+        text("INSERT INTO fhir_patients (fhir_id, gender, active) VALUES (:fhir_id, 'male', true)"),
+        {"fhir_id": fhir_id}
+    )
+
+    assert PatientService(db).delete_patient(fhir_id) is True
+
+    assert fhir_active(db, fhir_id) is False
+
+
+def test_delete_by_fhir_id_keeps_deid_record(db, patient):
+    """A FHIR id is not a pseudo id: the deid record and predictions stay."""
+    fhir_id, pseudo_id = patient
+
+    assert PatientService(db).delete_patient(fhir_id) is True
+
+    assert fhir_active(db, fhir_id) is False
+    assert db.query(DeidPatient).filter(DeidPatient.pseudo_id == pseudo_id).count() == 1
+    assert db.query(RiskPrediction).filter(
+        RiskPrediction.pseudo_patient_id == pseudo_id
+    ).count() == 1
+
+
+def test_delete_unknown_id(db, patient):
+    """An id matching neither table deletes nothing and returns False."""
+    fhir_id, pseudo_id = patient
+
+    assert PatientService(db).delete_patient(f"missing-{uuid.uuid4().hex[:8]}") is False
+
+    assert fhir_active(db, fhir_id) is True
+    assert db.query(DeidPatient).filter(DeidPatient.pseudo_id == pseudo_id).count() == 1
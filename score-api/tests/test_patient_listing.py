@@ -0,0 +1,134 @@
+"""Keyset pagination of the combined deid + FHIR patient listing."""
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import text
+
+from app.auth import get_current_user
+from app.main import NEXT_CURSOR_HEADER, NEXT_CURSOR_ID_HEADER, app
+from app.models import DeidPatient, User
+from app.services import PatientService
+
+PAGE_SIZE = 2
+MAX_PAGES = 100
+
+T1 = datetime(2024, 3, 1, 12, 0, tzinfo=timezone.utc)
+T2 = datetime(2024, 2, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def add_deid(db, pseudo_id, created_at):
+    """Insert an anonymized patient."""
+    db.add(DeidPatient(
+        id=uuid.uuid4(),
+        original_fhir_id=f"src-{pseudo_id}",
+        pseudo_id=pseudo_id,
+        deid_data={},
+        age_group="35-49",
+        gender="female",
+        created_at=created_at
+    ))
+    db.flush()
+
+
+def add_fhir(db, fhir_id, created_at, birth_date="1980-05-17"):
+    """Insert a FHIR patient that has not been anonymized."""
+    db.execute(
+        text("""
+            INSERT INTO fhir_patients (fhir_id, gender, birth_date, active, created_at)
+            VALUES (:fhir_id, 'male', :birth_date, true, CAST(:created_at AS timestamptz))
+        """),
+        {"fhir_id": fhir_id, "birth_date": birth_date, "created_at": created_at}
+    )
+
+
+@pytest.fixture
+def listing(fhir_patients):
+    """Deid and FHIR rows with tied and NULL creation times; returns the ids
+    in listing order (created_at DESC NULLS LAST, patient_id DESC)."""
+    db = fhir_patients
+    prefix = f"page-{uuid.uuid4().hex[:8]}"
+    deid = {f"{prefix}-d{i}": created_at for i, created_at in enumerate(
+        [T1, T1, T1, T2, None, None]
+    )}
+    fhir = {f"{prefix}-f{i}": created_at for i, created_at in enumerate(
+        [T1, T1, T2, None, None]
+    )}
+    for pseudo_id, created_at in deid.items():
+        add_deid(db, pseudo_id, created_at)
+    for fhir_id, created_at in fhir.items():
+        add_fhir(db, fhir_id, created_at)
+
+    created = {**deid, **fhir}
+    ids = sorted(created, reverse=True)
+    # Stable sort keeps the id DESC order within each creation time
+    ids.sort(key=lambda pid: (created[pid] is None, -(created[pid] or T1).timestamp()))
+    return prefix, ids
+
+
+def page_through_service(db):
+    """Walk every page of the service listing; returns the ids in order."""
+    service = PatientService(db)
+    after, after_id = None, None
+    seen = []
+    for _ in range(MAX_PAGES):
+        rows = service.list_patients_with_risk(limit=PAGE_SIZE, after=after, after_id=after_id)
+        seen.extend(row["patient_id"] for row in rows)
+        if len(rows) < PAGE_SIZE:
+            return seen
+        after, after_id = rows[-1]["created_at"], rows[-1]["patient_id"]
+    pytest.fail("listing did not terminate")
+
+
+def test_keyset_pages_cover_tied_and_null_rows_once(db, listing):
+    """No row is skipped or repeated across ties and NULL creation times."""
+    prefix, expected = listing
+
+    seen = page_through_service(db)
+
+    ours = [pid for pid in seen if pid.startswith(prefix)]
+    assert ours == expected
+    assert len(seen) == len(set(seen))
+
+
+@pytest.fixture
+def authorized(client):
+    """Client whose requests are authenticated as a stub clinician."""
+    app.dependency_overrides[get_current_user] = lambda: User(
+        id=uuid.uuid4(), username="pager", email="pager@example.com",
+        password_hash="x", role="clinician", is_active=True
+    )
+    try:
+        yield client
+    finally:
+        app.dependency_overrides.pop(get_current_user, None)
+
+
+def test_cursor_headers_page_through_listing(authorized, listing):
+    """Following X-Next-Cursor / X-Next-Cursor-Id visits every row once."""
+    prefix, expected = listing
+    params = {"limit": PAGE_SIZE}
+    seen = []
+    saw_id_only_cursor = False
+    for _ in range(MAX_PAGES):
+        response = authorized.get("/api/v1/patients", params=params)
+        assert response.status_code == 200
+        page = [patient["patient_id"] for patient in response.json()]
+        seen.extend(page)
+        if NEXT_CURSOR_ID_HEADER not in response.headers:
+            assert len(page) < PAGE_SIZE
+            break
+        assert response.headers[NEXT_CURSOR_ID_HEADER] == page[-1]
+        params = {"limit": PAGE_SIZE, "after_id": response.headers[NEXT_CURSOR_ID_HEADER]}
+        if NEXT_CURSOR_HEADER in response.headers:
+            params["after"] = response.headers[NEXT_CURSOR_HEADER]
+        else:
+            saw_id_only_cursor = True
+    else:
+        pytest.fail("listing did not terminate")
+
+    ours = [pid for pid in seen if pid.startswith(prefix)]
+    assert ours == expected
+    assert len(seen) == len(set(seen))
+    # The listing ends on NULL creation times, so the cursor switches to id only
+    assert saw_id_only_cursor
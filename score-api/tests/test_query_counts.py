@@ -0,0 +1,40 @@
+"""Query-count guards against N+1 regressions in the service layer."""
+import uuid
+from datetime import datetime, timezone
+
+from app.services import AuditService, PatientService, RiskScoreService, UserService
+
+
+def test_patient_summary_single_query(db, query_counter):
+    """Patient summary and latest prediction come back in one statement."""
+    assert PatientService(db).get_patient_summary("no-such-patient") is None
+    assert len(query_counter) == 1
+
+
+def test_dashboard_stats_single_query(db, query_counter):
+    """Live dashboard aggregates are computed in one statement."""
+    stats = RiskScoreService(db).compute_dashboard_stats()
+    assert stats["total_patients"] >= 0
+    assert len(query_counter) == 1
+
+
+def test_recent_audit_logs_single_query(db, query_counter):
+    """An audit log page is a single ordered, limited select."""
+    AuditService(db).get_recent_logs(limit=10)
+    assert len(query_counter) == 1
+
+
+def test_audit_log_keyset_page_single_query(db, query_counter):
+    """A keyset page after a (timestamp, id) cursor is still one select."""
+    AuditService(db).get_recent_logs(
+        limit=10,
+        before=datetime.now(timezone.utc),
+        before_id=str(uuid.uuid4())
+    )
+    assert len(query_counter) == 1
+
+
+def test_users_keyset_page_single_query(db, query_counter):
+    """A username-keyed user page is one select."""
+    UserService(db).get_all_users(limit=10, after="a")
+    assert len(query_counter) == 1
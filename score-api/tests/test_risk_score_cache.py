@@ -0,0 +1,61 @@
+"""Tests for coalesced risk score reads."""
+import asyncio
+
+import pytest
+
+from app import services
+from app.services import RiskScoreService
+
+
+class SlowRiskScoreService(RiskScoreService):
+    """Risk score service whose database read blocks until released."""
+
+    def __init__(self, release: asyncio.Event):
+        super().__init__(db=None)
+        self.release = release
+        self.loads = 0
+
+    async def _load_risk_score(self, patient_id):
+        self.loads += 1
+        await self.release.wait()
+        return {"pseudo_patient_id": patient_id, "risk_score": 0.42}
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_read():
+    """A second miss for the same patient waits on the first read."""
+    release = asyncio.Event()
+    service = SlowRiskScoreService(release)
+
+    first = asyncio.create_task(service.get_patient_risk_score_cached("p1"))
+    second = asyncio.create_task(service.get_patient_risk_score_cached("p1"))
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await first == await second == {"pseudo_patient_id": "p1", "risk_score": 0.42}
+    assert service.loads == 1
+    assert "p1" not in services._inflight_risk_scores
+
+
+@pytest.mark.asyncio
+async def test_cancelled_first_read_does_not_strand_waiters():
+    """Waiters fall back to their own read when the shared one is cancelled."""
+    first_release = asyncio.Event()
+    first_service = SlowRiskScoreService(first_release)
+    second_release = asyncio.Event()
+    second_service = SlowRiskScoreService(second_release)
+
+    first = asyncio.create_task(first_service.get_patient_risk_score_cached("p1"))
+    await asyncio.sleep(0)
+    second = asyncio.create_task(second_service.get_patient_risk_score_cached("p1"))
+    await asyncio.sleep(0)
+
+    first.cancel()
+    second_release.set()
+
+    result = await asyncio.wait_for(second, timeout=1)
+    assert result == {"pseudo_patient_id": "p1", "risk_score": 0.42}
+    assert second_service.loads == 1
+    with pytest.raises(asyncio.CancelledError):
+        await first
+    assert "p1" not in services._inflight_risk_scores